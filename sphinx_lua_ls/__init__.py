@@ -1,105 +1,178 @@
 from __future__ import annotations
 
-import fnmatch
+import concurrent.futures
+import hashlib
+import json
+import os
 import pathlib
-import re
+import pickle
+import tempfile
 import typing as _t
 
+import docutils.parsers.rst
 import sphinx.addnodes
 import sphinx.application
 import sphinx.builders
 import sphinx.builders.html
 import sphinx.domains
+import sphinx.environment
 import sphinx.errors
 from sphinx.util import logging
 from sphinx.util.console import get_terminal_width
 from sphinx.util.display import progress_message
 from sphinx.util.fileutil import copy_asset_file
 
-import sphinx_lua_ls.apidoc
 import sphinx_lua_ls.autodoc
 import sphinx_lua_ls.autoindex
 import sphinx_lua_ls.config
 import sphinx_lua_ls.domain
 import sphinx_lua_ls.inherited
 import sphinx_lua_ls.intersphinx
-import sphinx_lua_ls.lua_ls
 import sphinx_lua_ls.nodes
 import sphinx_lua_ls.objtree
 import sphinx_lua_ls.utils
 from sphinx_lua_ls._version import __version__, __version_tuple__  # noqa: F401
 from sphinx_lua_ls.pygments import LuaLexer
 
+if _t.TYPE_CHECKING:
+    import sphinx_lua_ls.lua_ls
+
 logger = logging.getLogger("sphinx_lua_ls")
 
 
-def run_lua_ls(app: sphinx.application.Sphinx):
-    domain: sphinx_lua_ls.domain.LuaDomain = app.env.get_domain("lua")  # type: ignore
+def initialize(app: sphinx.application.Sphinx):
+    domain = _t.cast(sphinx_lua_ls.domain.LuaDomain, app.env.get_domain("lua"))
+    sphinx_lua_ls.config.set_options(app, domain)
+    run_lua_ls(app, domain)
+    run_apidoc(app, domain)
+
 
+def run_lua_ls(app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain):
     if domain.config.backend == "disable":
         logger.debug("skipping lua-ls run: backend is 'disabled'")
         return
 
+    # Users discard environment to force re-analysis, don't use caches then.
+    fresh = _fresh_env_requested(app)
+    if "objtree" not in domain.data and not fresh:
+        _load_objtree_cache(app, domain)
+
     root_dir = domain.config.project_root
     project_directories = domain.config.project_directories
     if project_directories is None:
         project_directories = [root_dir]
-    project_directories.sort()
+    else:
+        project_directories = _dedup_project_directories(project_directories)
+    # Directories are always sorted, we only need to compare them as a set.
+    roots = frozenset(project_directories)
+
+    configs = []
+    if (path := pathlib.Path(root_dir, ".emmyrc.json")).exists():
+        configs.append(path)
+    if (path := pathlib.Path(root_dir, ".luarc.json")).exists():
+        configs.append(path)
+
+    # Content hashes let us find files that were actually changed, even if
+    # their modification times were not preserved (i.e. on CI), or if they were
+    # touched without being changed.
+    old_hashes: dict[str, tuple[int, int, bytes]] = domain.data.get(
+        "objtree_hashes", {}
+    )
+    config_hashes = {
+        str(path): _hash_file(str(path), os.stat(path), old_hashes) for path in configs
+    }
+
+    # For every project directory, we store modification times of all its
+    # subdirectories and a list of found lua files. If none of the subdirectories
+    # were modified, no files were added or removed, so we can skip the walk.
+    old_dir_listings: dict[pathlib.Path, tuple[dict[str, int], list[str]]] = (
+        domain.data.get("objtree_dir_listings", {})
+    )
+    dir_listings: dict[pathlib.Path, tuple[dict[str, int], list[str]]] = {}
+    lua_files: dict[str, os.stat_result] = {}
+    dir_signatures: dict[pathlib.Path, bytes] = {}
+    for dir in project_directories:
+        dir_files = _find_lua_files(dir, old_dir_listings.get(dir))
+        if dir_files is None:
+            dir_mtimes: dict[str, int] = {}
+            dir_files = dict(_iter_lua_files(dir, dir_mtimes))
+            dir_listings[dir] = (dir_mtimes, list(dir_files))
+        else:
+            dir_listings[dir] = old_dir_listings[dir]
+        dir_signatures[dir] = _lua_files_signature(dir, config_hashes, dir_files)
+        lua_files.update(dir_files)
+
+    # Language server can report files outside of project directories
+    # (i.e. libraries). Directory walk doesn't find them, so we stat them here.
+    foreign_mtimes: dict[str, int] = {}
+    for path in domain.data.get("objtree_paths", {}):
+        if path not in lua_files and path not in config_hashes:
+            try:
+                foreign_mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                foreign_mtimes[path] = -1
+
+    signature = _objtree_signature(dir_signatures, foreign_mtimes)
+    domain.data["objtree_dir_listings"] = dir_listings
 
     modified = (
         "objtree" not in domain.data
         or "objtree_roots" not in domain.data
         or "objtree_paths" not in domain.data
-        or domain.data["objtree_roots"] != project_directories
+        or "objtree_signature" not in domain.data
+        or domain.data["objtree_roots"] != roots
     )
-    if not modified:
-        for path, modtime in domain.data["objtree_paths"].items():
-            if not path.exists() or path.stat().st_mtime_ns > modtime:
-                modified = True
-                break
-    if not modified:
-        for dir in project_directories:
-            for path in dir.rglob("*.lua"):
-                if path not in domain.data["objtree_paths"]:
-                    modified = True
-                    break
+    if not modified and domain.data["objtree_signature"] != signature:
+        touched = _find_touched_files(
+            domain.data["objtree_paths"], lua_files, config_hashes, old_hashes
+        )
+        if touched is None:
+            modified = True
+        else:
+            # Files were touched, but their content is the same.
+            domain.data["objtree_signature"] = signature
+            domain.data["objtree_hashes"] = {**old_hashes, **touched}
+            domain.data["objtree_paths"] = {
+                p: h[1] for p, h in domain.data["objtree_hashes"].items()
+            }
     if not modified:
         logger.debug(
             "skipping lua-ls run: lua files were not modified since previous run"
         )
+        domain.data["objtree_changed"] = set()
         return
 
-    cwd = pathlib.Path.cwd()
-    try:
-        runner = sphinx_lua_ls.lua_ls.resolve(
-            backend=domain.config.backend,
-            min_version=domain.config.min_version,
-            max_version=domain.config.max_version,
-            skip_versions=domain.config.skip_versions,
-            cwd=root_dir,
-            reporter=sphinx_lua_ls.lua_ls.SphinxProgressReporter(app.verbosity),
-            install=domain.config.auto_install,
-            cache_path=domain.config.auto_install_location,
-        )
-    except sphinx_lua_ls.lua_ls.LuaLsError:
-        raise
-    except Exception as e:
-        raise sphinx.errors.ExtensionError(str(e)) from e
-
     if domain.config.backend == "luals":
         parser = sphinx_lua_ls.objtree.LuaLsParser()
     else:
         parser = sphinx_lua_ls.objtree.EmmyLuaParser()
 
-    configs = []
-    if (path := pathlib.Path(root_dir, ".emmyrc.json")).exists():
-        configs.append(path)
-    if (path := pathlib.Path(root_dir, ".luarc.json")).exists():
-        configs.append(path)
-    parser.files.update(configs)
-
     vcs_root = sphinx_lua_ls.utils.find_topmost_vcs_root(root_dir)
 
+    hashes: dict[str, tuple[int, int, bytes]] = dict(config_hashes)
+    for path, stat in lua_files.items():
+        hashes[path] = _hash_file(path, stat, old_hashes)
+
+    # Output of a directory can depend on configs and on any file outside
+    # of project directories, so we include them in every directory's digest.
+    # Removed files are skipped, which changes the digest as well.
+    shared_digests = {path: h[2] for path, h in config_hashes.items()}
+    for path in domain.data.get("objtree_paths", {}):
+        if path not in hashes:
+            try:
+                shared_digests[path] = _hash_file(path, os.stat(path), old_hashes)[2]
+            except OSError:
+                pass
+
+    # Language server output for directories whose contents didn't change since
+    # the previous run can be reused, even if some of their files were touched.
+    # Outputs are large, so we keep them in a separate cache file instead
+    # of the environment.
+    old_dir_outputs = {} if fresh else _load_dir_outputs(app, domain)
+    dir_digests: dict[pathlib.Path, bytes] = {}
+    dir_outputs: dict[pathlib.Path, str] = {}
+
+    pending: list[pathlib.Path] = []
     for dir in project_directories:
         if vcs_root and not dir.is_relative_to(vcs_root):
             logger.warning(
@@ -109,31 +182,95 @@ def run_lua_ls(app: sphinx.application.Sphinx):
                 type="lua-ls",
             )
 
-        try:
-            relpath = dir.relative_to(cwd, walk_up=True)
-        except ValueError:
-            relpath = dir
-        if str(relpath).endswith(".."):
-            relpath = dir
-        with progress_message(f"running lua language server in {relpath or '.'}"):
-            parser.class_default_function_name = (
-                domain.config.class_default_function_name
-            )
-            parser.class_default_force_non_colon = (
-                domain.config.class_default_force_non_colon
-            )
-            parser.class_default_force_return_self = (
-                domain.config.class_default_force_return_self
-            )
-            parser.parse(runner.run(dir, configs=configs), dir)
-            parser.files.update(map(pathlib.Path, dir.rglob("*.lua")))
+        dir_digests[dir] = _lua_files_digest(
+            dir, shared_digests, dir_listings[dir][1], hashes
+        )
+        if dir in old_dir_outputs and old_dir_outputs[dir][0] == dir_digests[dir]:
+            logger.debug("reusing lua-ls output for %s", dir)
+            dir_outputs[dir] = old_dir_outputs[dir][1]
+        else:
+            pending.append(dir)
+
+    outputs: dict[pathlib.Path, _t.Any] = {}
+    if pending:
+        runner = _resolve_runner(app, domain)
+        cwd = pathlib.Path.cwd()
+        relpaths = ", ".join(_relpath(dir, cwd) for dir in pending)
+        with progress_message(f"running lua language server in {relpaths}"):
+            if len(pending) == 1:
+                outputs[pending[0]] = runner.run(pending[0], configs=configs)
+            else:
+                # Language server runs in a subprocess, so we can run several
+                # of them at once. Outputs are still parsed in order below.
+                # Console output of parallel runs would be interleaved, so we
+                # capture it; it's still reported with the error if a run fails.
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(len(pending), os.cpu_count() or 4)
+                ) as executor:
+                    futures = {
+                        dir: executor.submit(
+                            runner.run, dir, quiet=True, configs=configs
+                        )
+                        for dir in pending
+                    }
+                    outputs = {dir: future.result() for dir, future in futures.items()}
 
-    domain.objtree = parser.root
-    domain.data["objtree_roots"] = project_directories
-    domain.data["objtree_paths"] = {p: p.stat().st_mtime_ns for p in parser.files}
+    for dir in project_directories:
+        parser.class_default_function_name = domain.config.class_default_function_name
+        parser.class_default_force_non_colon = (
+            domain.config.class_default_force_non_colon
+        )
+        parser.class_default_force_return_self = (
+            domain.config.class_default_force_return_self
+        )
 
-    if parser.runtime_version and not domain.config.lua_version:
-        domain.config.lua_version = parser.runtime_version
+        if dir in outputs:
+            output = outputs[dir]
+            dir_outputs[dir] = json.dumps(output)
+        else:
+            output = json.loads(dir_outputs[dir])
+        parser.parse(output, dir)
+
+    # Parser reports files as paths, we work with strings to avoid
+    # converting every lua file found on disk.
+    for p in map(str, parser.files):
+        if p not in hashes:
+            hashes[p] = _hash_file(p, os.stat(p), old_hashes)
+
+    changed: set[str] = set()
+    for p in hashes:
+        cached = old_hashes.get(p)
+        if cached is None or cached[2] != hashes[p][2]:
+            changed.add(p)
+    changed.update(old_hashes.keys() - hashes.keys())
+
+    # Signature and digests should account for foreign files found during
+    # this run.
+    foreign_mtimes = {
+        p: h[1]
+        for p, h in hashes.items()
+        if p not in lua_files and p not in config_hashes
+    }
+    signature = _objtree_signature(dir_signatures, foreign_mtimes)
+    shared_digests = {p: h[2] for p, h in hashes.items() if p not in lua_files}
+    for dir in project_directories:
+        dir_digests[dir] = _lua_files_digest(
+            dir, shared_digests, dir_listings[dir][1], hashes
+        )
+
+    domain.objtree = parser.root
+    domain.data["objtree_roots"] = roots
+    domain.data["objtree_paths"] = {p: h[1] for p, h in hashes.items()}
+    domain.data["objtree_hashes"] = hashes
+    domain.data["objtree_changed"] = changed
+    domain.data["objtree_signature"] = signature
+    domain.data["objtree_runtime_version"] = parser.runtime_version
+    _save_objtree_cache(app, domain)
+    _save_dir_outputs(
+        app,
+        domain,
+        {dir: (dir_digests[dir], dir_outputs[dir]) for dir in project_directories},
+    )
 
     logger.debug("Lua analysis finished. Found objects:")
     logger.debug("-" * get_terminal_width())
@@ -142,10 +279,324 @@ def run_lua_ls(app: sphinx.application.Sphinx):
     logger.debug("-" * get_terminal_width())
 
 
-def run_apidoc(
+#: Keys from domain data that are saved to the objtree cache.
+_OBJTREE_CACHE_KEYS = (
+    "objtree",
+    "objtree_roots",
+    "objtree_paths",
+    "objtree_hashes",
+    "objtree_signature",
+    "objtree_dir_listings",
+    "objtree_runtime_version",
+)
+
+
+def _fresh_env_requested(app: sphinx.application.Sphinx) -> bool:
+    """
+    Check if Sphinx discarded environment saved by a previous build,
+    i.e. when it was run with ``-E``.
+
+    """
+
+    return bool(app.fresh_env_used) and (
+        pathlib.Path(app.doctreedir, sphinx.application.ENV_PICKLE_FILENAME).exists()
+    )
+
+
+def _load_objtree_cache(
+    app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain
+):
+    """
+    Load results of the previous lua-ls run if Sphinx environment was lost.
+    Cached results are keyed by config hash, and go through the same freshness
+    check as the ones stored in the environment.
+
+    """
+
+    path = pathlib.Path(app.doctreedir, "sphinx_lua_ls_objtree.cache")
+    try:
+        with open(path, "rb") as f:
+            cached_key, data = pickle.load(f)
+    except Exception:
+        return
+    if cached_key != domain.data.get("config_key") or not isinstance(data, dict):
+        return
+    logger.debug("using cached lua-ls results")
+    domain.data.update({key: data[key] for key in _OBJTREE_CACHE_KEYS if key in data})
+
+
+def _save_objtree_cache(
+    app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain
+):
+    path = pathlib.Path(app.doctreedir, "sphinx_lua_ls_objtree.cache")
+    data = {key: domain.data[key] for key in _OBJTREE_CACHE_KEYS if key in domain.data}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, delete=False
+        ) as f:
+            pickle.dump((domain.data.get("config_key"), data), f)
+        os.replace(f.name, path)
+    except Exception as e:
+        logger.debug("failed to save lua-ls results cache: %s", e)
+
+
+def _load_dir_outputs(
+    app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain
+) -> dict[pathlib.Path, tuple[bytes, str]]:
+    """
+    Load language server outputs from the previous run, along with digests
+    of directories they were produced for.
+
+    """
+
+    path = pathlib.Path(app.doctreedir, "sphinx_lua_ls_outputs.cache")
+    try:
+        with open(path, "rb") as f:
+            cached_key, outputs = pickle.load(f)
+    except Exception:
+        return {}
+    if cached_key != domain.data.get("config_key") or not isinstance(outputs, dict):
+        return {}
+    return outputs
+
+
+def _save_dir_outputs(
     app: sphinx.application.Sphinx,
+    domain: sphinx_lua_ls.domain.LuaDomain,
+    outputs: dict[pathlib.Path, tuple[bytes, str]],
 ):
-    domain = _t.cast(sphinx_lua_ls.domain.LuaDomain, app.env.get_domain("lua"))
+    path = pathlib.Path(app.doctreedir, "sphinx_lua_ls_outputs.cache")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, delete=False
+        ) as f:
+            pickle.dump((domain.data.get("config_key"), outputs), f)
+        os.replace(f.name, path)
+    except Exception as e:
+        logger.debug("failed to save lua-ls outputs cache: %s", e)
+
+
+def _relpath(dir: pathlib.Path, cwd: pathlib.Path) -> str:
+    try:
+        relpath = dir.relative_to(cwd, walk_up=True)
+    except ValueError:
+        relpath = dir
+    if str(relpath).endswith(".."):
+        relpath = dir
+    return str(relpath) or "."
+
+
+def _resolve_runner(
+    app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain
+) -> sphinx_lua_ls.lua_ls.LuaLs:
+    # Installer pulls in GitHub client, which is slow to import.
+    import sphinx_lua_ls.lua_ls
+
+    try:
+        return sphinx_lua_ls.lua_ls.resolve(
+            backend=_t.cast(_t.Literal["emmylua", "luals"], domain.config.backend),
+            min_version=domain.config.min_version,
+            max_version=domain.config.max_version,
+            skip_versions=domain.config.skip_versions,
+            cwd=domain.config.project_root,
+            reporter=sphinx_lua_ls.lua_ls.SphinxProgressReporter(app.verbosity),
+            install=domain.config.auto_install,
+            cache_path=domain.config.auto_install_location,
+        )
+    except sphinx_lua_ls.lua_ls.LuaLsError:
+        raise
+    except Exception as e:
+        raise sphinx.errors.ExtensionError(str(e)) from e
+
+
+def _dedup_project_directories(
+    project_directories: list[pathlib.Path],
+) -> list[pathlib.Path]:
+    """
+    Sort project directories and remove ones that are nested in other directories,
+    so that we don't analyze the same files twice.
+
+    """
+
+    result: list[pathlib.Path] = []
+    for dir in sorted(project_directories):
+        # After sorting, parent directory always comes right before its children.
+        if result and dir.is_relative_to(result[-1]):
+            if dir != result[-1]:
+                logger.warning(
+                    "project directory %s is inside of %s, it will not be processed "
+                    "separately",
+                    dir,
+                    result[-1],
+                    type="lua-ls",
+                )
+            continue
+        result.append(dir)
+    return result
+
+
+def _find_lua_files(
+    root: pathlib.Path, listing: tuple[dict[str, int], list[str]] | None
+) -> dict[str, os.stat_result] | None:
+    """
+    Stat lua files from a previous directory listing, return `None` if listing
+    is outdated and directory needs to be walked again.
+
+    """
+
+    if listing is None:
+        return None
+    dir_mtimes, paths = listing
+    try:
+        for path, mtime in dir_mtimes.items():
+            if os.stat(path).st_mtime_ns != mtime:
+                return None
+        return {path: os.stat(path) for path in paths}
+    except OSError:
+        return None
+
+
+def _iter_lua_files(
+    root: pathlib.Path, dir_mtimes: dict[str, int]
+) -> _t.Iterator[tuple[str, os.stat_result]]:
+    """
+    Recursively find all lua files in a directory, yield their paths
+    and stat results. Save modification times of all visited directories
+    to `dir_mtimes`.
+
+    """
+
+    stack = [str(root)]
+    while stack:
+        path = stack.pop()
+        try:
+            # Stat before listing, so that changes made while we're scanning
+            # are noticed next time.
+            dir_mtimes[path] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".lua") and entry.is_file():
+                        yield entry.path, entry.stat()
+        except OSError:
+            pass
+
+
+def _find_touched_files(
+    objtree_paths: dict[str, int],
+    lua_files: dict[str, os.stat_result],
+    config_hashes: dict[str, tuple[int, int, bytes]],
+    old_hashes: dict[str, tuple[int, int, bytes]],
+) -> dict[str, tuple[int, int, bytes]] | None:
+    """
+    Find files that have different modification times than during the previous
+    run, but the same content. Return `None` as soon as we find a file that was added,
+    removed, or actually changed.
+
+    """
+
+    # New files can be found without any syscalls, so check them first.
+    if not lua_files.keys() <= objtree_paths.keys():
+        return None
+    if not config_hashes.keys() <= objtree_paths.keys():
+        return None
+
+    # Modification times of lua files are already known from the directory
+    # walk, we only need to stat files that weren't found there (i.e. configs).
+    touched: dict[str, tuple[int, int, bytes]] = {}
+    for path, modtime in objtree_paths.items():
+        stat = lua_files.get(path)
+        if stat is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+        # Modification time can go backwards, i.e. when files are restored
+        # from an archive, so any difference means that we need to check content.
+        if stat.st_mtime_ns != modtime:
+            cached = old_hashes.get(path)
+            touched[path] = _hash_file(path, stat, old_hashes)
+            if cached is None or cached[2] != touched[path][2]:
+                return None
+    return touched
+
+
+def _hash_file(
+    path: str, stat: os.stat_result, old_hashes: dict[str, tuple[int, int, bytes]]
+) -> tuple[int, int, bytes]:
+    """
+    Return file's size, modification time and content hash. Reuse hash
+    from `old_hashes` if size and modification time didn't change.
+
+    """
+
+    cached = old_hashes.get(path)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "blake2b").digest()
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+def _lua_files_signature(
+    dir: pathlib.Path,
+    config_hashes: dict[str, tuple[int, int, bytes]],
+    lua_files: dict[str, os.stat_result],
+) -> bytes:
+    """
+    Hash paths and modification times of all lua files, and contents of configs.
+
+    """
+
+    signature = hashlib.blake2b(f"{dir}\0".encode())
+    for path, (_, _, digest) in config_hashes.items():
+        signature.update(f"{path}\0".encode() + digest)
+    for path, stat in sorted(lua_files.items()):
+        signature.update(f"{path}\0{stat.st_mtime_ns}\0".encode())
+    return signature.digest()
+
+
+def _objtree_signature(
+    dir_signatures: dict[pathlib.Path, bytes], foreign_mtimes: dict[str, int]
+) -> bytes:
+    """
+    Combine signatures of project directories with modification times of files
+    found outside of them.
+
+    """
+
+    signature = hashlib.blake2b(b"".join(dir_signatures.values()))
+    for path, mtime in sorted(foreign_mtimes.items()):
+        signature.update(f"{path}\0{mtime}\0".encode())
+    return signature.digest()
+
+
+def _lua_files_digest(
+    dir: pathlib.Path,
+    shared_digests: dict[str, bytes],
+    paths: list[str],
+    hashes: dict[str, tuple[int, int, bytes]],
+) -> bytes:
+    """
+    Hash paths and contents of all lua files in a directory, as well as
+    contents of configs and files outside of project directories.
+
+    """
+
+    digest = hashlib.blake2b(f"{dir}\0".encode())
+    for path, file_digest in sorted(shared_digests.items()):
+        digest.update(f"{path}\0".encode() + file_digest)
+    for path in sorted(paths):
+        digest.update(f"{path}\0".encode() + hashes[path][2])
+    return digest.digest()
+
+
+def run_apidoc(app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain):
+    from sphinx_lua_ls import apidoc
+
     if domain.config.backend == "disable":
         logger.warning(
             "apidoc requested, but the language server backend is disabled",
@@ -154,19 +605,9 @@ def run_apidoc(
         return
     cwd = pathlib.Path.cwd()
     for name, params in domain.config.apidoc_roots.items():
-        try:
-            relpath = params["path"].relative_to(cwd, walk_up=True)
-        except ValueError:
-            relpath = params["path"]
-        with progress_message(f"running lua apidoc in {relpath or '.'}"):
-            ignored_modules = params["ignored_modules"]
-            if ignored_modules:
-                mod_filter = re.compile(
-                    "|".join(f"(?:{fnmatch.translate(e)})" for e in ignored_modules)
-                ).match
-            else:
-                mod_filter = lambda s: False
-            sphinx_lua_ls.apidoc.generate(
+        relpath = _relpath(params["path"], cwd)
+        with progress_message(f"running lua apidoc in {relpath}"):
+            apidoc.generate(
                 outdir=app.outdir,
                 domain=domain,
                 dir=params["path"],
@@ -174,7 +615,9 @@ def run_apidoc(
                 objtree=domain.objtree,
                 options=params["options"],
                 depth=params["max_depth"],
-                mod_filter=mod_filter,
+                mod_filter=sphinx_lua_ls.config.compile_mod_filter(
+                    params["ignored_modules"]
+                ),
                 format=params["format"],
                 separate_members=params["separate_members"],
             )
@@ -184,9 +627,42 @@ def copy_asset_files(app: sphinx.application.Sphinx, exc: Exception | None):
     if isinstance(app.builder, sphinx.builders.html.StandaloneHTMLBuilder) and not exc:
         custom_file = pathlib.Path(__file__).parent / "static/lua.css"
         static_dir = app.outdir / "_static"
+        # Sphinx preserves modification time when copying assets, so we can skip
+        # copying if the file is already there.
+        src_stat = custom_file.stat()
+        try:
+            dst_stat = (static_dir / custom_file.name).stat()
+        except OSError:
+            pass
+        else:
+            if (src_stat.st_size, src_stat.st_mtime_ns) == (
+                dst_stat.st_size,
+                dst_stat.st_mtime_ns,
+            ):
+                return
         copy_asset_file(custom_file, static_dir)
 
 
+def get_outdated_docs(
+    app: sphinx.application.Sphinx,
+    env: sphinx.environment.BuildEnvironment,
+    added: set[str],
+    changed: set[str],
+    removed: set[str],
+) -> list[str]:
+    domain = _t.cast(sphinx_lua_ls.domain.LuaDomain, env.get_domain("lua"))
+    changed_files: set[str] = domain.data.get("objtree_changed", set())
+    if not changed_files:
+        return []
+    # Sphinx stores dependencies relative to srcdir, so files outside of it
+    # end up with `..` in their paths.
+    return [
+        docname
+        for docname, deps in env.dependencies.items()
+        if any(os.path.normpath(dep) in changed_files for dep in deps)
+    ]
+
+
 def suppress_auto_ref_warnings(
     app: sphinx.application.Sphinx,
     domain: sphinx.domains.Domain,
@@ -198,6 +674,26 @@ def suppress_auto_ref_warnings(
         return None
 
 
+#: Directives added to the lua domain by this extension.
+_DIRECTIVES: tuple[tuple[str, type[docutils.parsers.rst.Directive]], ...] = (
+    ("autoobject", sphinx_lua_ls.autodoc.AutoObjectDirective),
+    ("autofunction", sphinx_lua_ls.autodoc.AutoFunctionDirective),
+    ("autodata", sphinx_lua_ls.autodoc.AutoDataDirective),
+    ("autoconst", sphinx_lua_ls.autodoc.AutoConstDirective),
+    ("autoclass", sphinx_lua_ls.autodoc.AutoClassDirective),
+    ("autoalias", sphinx_lua_ls.autodoc.AutoAliasDirective),
+    ("autoenum", sphinx_lua_ls.autodoc.AutoEnumDirective),
+    ("automethod", sphinx_lua_ls.autodoc.AutoMethodDirective),
+    ("autoclassmethod", sphinx_lua_ls.autodoc.AutoClassmethodDirective),
+    ("autostaticmethod", sphinx_lua_ls.autodoc.AutoStaticmethodDirective),
+    ("autoattribute", sphinx_lua_ls.autodoc.AutoAttributeDirective),
+    ("autotable", sphinx_lua_ls.autodoc.AutoTableDirective),
+    ("automodule", sphinx_lua_ls.autodoc.AutoModuleDirective),
+    ("autoindex", sphinx_lua_ls.autoindex.AutoIndexDirective),
+    ("other-inherited-members", sphinx_lua_ls.inherited.InheritedMembersDirective),
+)
+
+
 def setup(app: sphinx.application.Sphinx):
     app.add_domain(sphinx_lua_ls.domain.LuaDomain)
 
@@ -223,57 +719,11 @@ def setup(app: sphinx.application.Sphinx):
     app.add_config_value("lua_ls_maximum_signature_line_length", 50, rebuild="env")
     app.add_config_value("lua_ls_verbose", False, rebuild="")
 
-    app.add_directive_to_domain(
-        "lua", "autoobject", sphinx_lua_ls.autodoc.AutoObjectDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autofunction", sphinx_lua_ls.autodoc.AutoFunctionDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autodata", sphinx_lua_ls.autodoc.AutoDataDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoconst", sphinx_lua_ls.autodoc.AutoConstDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoclass", sphinx_lua_ls.autodoc.AutoClassDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoalias", sphinx_lua_ls.autodoc.AutoAliasDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoenum", sphinx_lua_ls.autodoc.AutoEnumDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "automethod", sphinx_lua_ls.autodoc.AutoMethodDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoclassmethod", sphinx_lua_ls.autodoc.AutoClassmethodDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autostaticmethod", sphinx_lua_ls.autodoc.AutoStaticmethodDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoattribute", sphinx_lua_ls.autodoc.AutoAttributeDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autotable", sphinx_lua_ls.autodoc.AutoTableDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "automodule", sphinx_lua_ls.autodoc.AutoModuleDirective
-    )
-    app.add_directive_to_domain(
-        "lua", "autoindex", sphinx_lua_ls.autoindex.AutoIndexDirective
-    )
-    app.add_directive_to_domain(
-        "lua",
-        "other-inherited-members",
-        sphinx_lua_ls.inherited.InheritedMembersDirective,
-    )
+    for name, directive in _DIRECTIVES:
+        app.add_directive_to_domain("lua", name, directive)
 
-    app.connect("builder-inited", sphinx_lua_ls.config.set_options)
-    app.connect("builder-inited", run_lua_ls)
-    app.connect("builder-inited", run_apidoc)
+    app.connect("builder-inited", initialize)
+    app.connect("env-get-outdated", get_outdated_docs)
     app.connect("missing-reference", sphinx_lua_ls.intersphinx.resolve_std_reference)
     app.connect("build-finished", copy_asset_files)
     app.connect("warn-missing-reference", suppress_auto_ref_warnings)
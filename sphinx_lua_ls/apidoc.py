@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import concurrent.futures
+import functools
+import hashlib
 import os
 import pathlib
+import string
 import subprocess
 import sys
+import tempfile
 import urllib.parse
 from typing import Any, Callable
 
-import jinja2
 import sphinx.errors
 from sphinx.util import logging
 
@@ -18,54 +22,61 @@ from sphinx_lua_ls.utils import normalize_name
 
 _logger = logging.getLogger("sphinx_lua_ls")
 
-_ENV = jinja2.Environment()
-_ENV.filters["h1"] = lambda title: f"{title}\n{'=' * len(title)}"  # type: ignore
-_ENV.filters["h2"] = lambda title: f"{title}\n{'-' * len(title)}"  # type: ignore
-_ENV.filters["h3"] = lambda title: f"{title}\n{'~' * len(title)}"  # type: ignore
-_ENV.filters["mangle"] = lambda name: _mangle_filename(name)  # type: ignore
+#: Directories that are known to be case-sensitive, identified by their
+#: device and inode numbers. Probing them takes several syscalls, and a directory
+#: doesn't become case-insensitive between builds.
+_CASE_SENSITIVE_DIRS: set[tuple[int, int]] = set()
 
-_TEMPLATE_RST = _ENV.from_string(
-    """{{ title | h1 }}
+#: Directories that `fsutil.exe` failed to make case-sensitive. We still probe
+#: them in case user fixes them manually, but we don't spawn `fsutil.exe` again.
+_FSUTIL_FAILED_DIRS: set[tuple[int, int]] = set()
 
-.. lua:currentmodule:: {{ parent_modname }}
+#: Sizes, modification times and content hashes of pages that were written
+#: or checked during previous builds in this process. If page's size and
+#: modification time didn't change, we compare hashes instead of reading it.
+_PAGE_DIGESTS: dict[str, tuple[int, int, bytes]] = {}
 
-.. lua:autoobject:: {{ fullname }}
-   {% for option, value in options.items() %}:{{ option }}: {{ value }}
-   {% endfor %}
 
-{% if submodules %}
-.. toctree::
-   :hidden:
-
-   {% for child_fullname in submodules %}
-   {{ child_fullname | mangle }}.rst
-   {% endfor %}
-{% endif %}
-""".lstrip()
-)
-
-_TEMPLATE_MD = _ENV.from_string(
-    """# {{ title }}
-
-```{lua:currentmodule} {{ parent_modname }}
-```
-
-```{lua:autoobject} {{ fullname }}
-{% for option, value in options.items() %}:{{ option }}: {{ value }}
-{% endfor %}
-```
-
-{% if submodules %}
-```{toctree}
-:hidden:
-
-{% for child_fullname in submodules %}
-{{ child_fullname | mangle }}.md
-{% endfor %}
-```
-{% endif %}
-""".lstrip()
-)
+def _render_rst(
+    title: str,
+    fullname: str,
+    options: dict[str, str],
+    submodules: dict[str, tuple[Object, bool]],
+    parent_modname: str,
+) -> str:
+    parts = [
+        f"{title}\n{'=' * len(title)}\n\n",
+        f".. lua:currentmodule:: {parent_modname}\n\n",
+        f".. lua:autoobject:: {fullname}\n   ",
+    ]
+    parts.extend(f":{option}: {value}\n   " for option, value in options.items())
+    parts.append("\n\n")
+    if submodules:
+        parts.append("\n.. toctree::\n   :hidden:\n\n   ")
+        parts.extend(f"\n   {_mangle_filename(name)}.rst\n   " for name in submodules)
+        parts.append("\n")
+    return "".join(parts)
+
+
+def _render_md(
+    title: str,
+    fullname: str,
+    options: dict[str, str],
+    submodules: dict[str, tuple[Object, bool]],
+    parent_modname: str,
+) -> str:
+    parts = [
+        f"# {title}\n\n",
+        f"```{{lua:currentmodule}} {parent_modname}\n```\n\n",
+        f"```{{lua:autoobject}} {fullname}\n",
+    ]
+    parts.extend(f":{option}: {value}\n" for option, value in options.items())
+    parts.append("\n```\n\n")
+    if submodules:
+        parts.append("\n```{toctree}\n:hidden:\n\n")
+        parts.extend(f"\n{_mangle_filename(name)}.md\n" for name in submodules)
+        parts.append("\n```\n")
+    return "".join(parts)
 
 
 def generate(
@@ -84,29 +95,87 @@ def generate(
     out_is_case_sensitive = _make_case_sensitive(outdir)
     is_case_insensitive = not dir_is_case_sensitive or not out_is_case_sensitive
 
-    options.setdefault("members", True)
-    options.setdefault("recursive", True)
-    options.setdefault("index-table", True)
+    # Options are shared between api roots, so we can't use `setdefault`.
+    # Defaults are added after explicit options to keep their order stable.
+    options = {**options}
+    for name in ("members", "recursive", "index-table"):
+        options.setdefault(name, True)
+    # Most options are the same for all pages, so we only format them once.
+    page_options = {name: _format_option(value) for name, value in options.items()}
+    # Object type names are translated lazily, so we can't build this table
+    # at import time.
+    lnames = {kind: LuaDomain.object_types[kind.value].lname.title() for kind in Kind}
 
     # Note: it's important to work with string file paths
     # due to case sensitivity issues.
     files: set[str] = set()
-    _generate(
-        domain=domain,
-        dir=dir,
-        fullname=fullname,
-        objtree=objtree,
-        depth=depth,
-        options=options,
-        mod_filter=mod_filter,
-        files=files,
-        format=format,
-        separate_members=separate_members,
-        is_toplevel=True,
-    )
+
+    obj, modname, classname, objname = objtree.find_path(fullname)
+    if not obj:
+        parent = ".".join(filter(None, [modname, classname])) or "<global namespace>"
+        msg = f"unknown lua object {fullname}:\n"
+        msg += f"  {parent} has no item {objname!r}\n"
+        msg += "Hint: set `lua_ls_verbose = True` in conf.py to see all objects exported by lua analyzer.\n"
+        msg += "Hint: see troubleshooting guide at https://sphinx-lua-ls.readthedocs.io/en/latest/troubleshooring.html"
+        raise sphinx.errors.ConfigError(msg)
+
+    # Pages are generated depth-first, in the same order as they appear in toctrees.
+    # Stack items are `(obj, fullname, depth, is_toplevel, is_global, parent_modname)`.
+    # We pass objects along with their names, so that we don't have to look up
+    # every page's object in the tree.
+    stack: list[tuple[Object, str, int, bool, bool, str | None]] = [
+        (obj, fullname, depth, True, False, None)
+    ]
+    # Pages are checked and written in background threads while we render
+    # the rest of them. On case-insensitive file systems, different pages can
+    # end up in the same file; writes to it should happen in order.
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(32, (os.cpu_count() or 1) + 4)
+    ) as executor:
+        writes: dict[str, concurrent.futures.Future[None]] = {}
+        while stack:
+            obj, fullname, depth, is_toplevel, is_global, parent_modname = stack.pop()
+            filepath, page, submodules = _generate(
+                domain=domain,
+                dir=dir,
+                obj=obj,
+                fullname=fullname,
+                objtree=objtree,
+                depth=depth,
+                options=options,
+                page_options=page_options,
+                lnames=lnames,
+                mod_filter=mod_filter,
+                format=format,
+                separate_members=separate_members,
+                is_toplevel=is_toplevel,
+                is_global=is_global,
+                parent_modname=parent_modname,
+            )
+            files.add(str(filepath))
+            if previous := writes.get(key := str(filepath).lower()):
+                previous.result()
+            writes[key] = executor.submit(
+                _write_if_changed, filepath, page.encode("utf-8")
+            )
+            stack.extend(
+                (
+                    child,
+                    child_fullname,
+                    depth - 1,
+                    False,
+                    child_is_global,
+                    fullname if child_is_global else parent_modname,
+                )
+                for child_fullname, (child, child_is_global) in reversed(
+                    submodules.items()
+                )
+            )
+        for write in writes.values():
+            write.result()
 
     if (is_case_insensitive or pathlib.Path("a") == pathlib.Path("A")) and (
-        len(files) != len({f.lower() for f in files})
+        len(files) != len(writes)
     ):
         msg = (
             "Running Lua apidoc on case-insensitive file system."
@@ -123,106 +192,106 @@ def generate(
             )
         _logger.warning(msg, type="lua-ls")
 
-    removed: set[str] = {str(f) for f in dir.iterdir()}
-    removed -= files
-
+    with os.scandir(dir) as entries:
+        removed = [entry.path for entry in entries if entry.path not in files]
     for file in removed:
-        os.remove(file)
+        os.unlink(file)
 
 
 def _generate(
     domain: LuaDomain,
     dir: pathlib.Path,
+    obj: Object,
     fullname: str,
     objtree: Object,
     depth: int,
     options: dict[str, Any],
+    page_options: dict[str, str],
+    lnames: dict[Kind, str],
     mod_filter: Callable[[str], Any],
-    files: set[str],
     format: str,
     separate_members: bool,
     is_toplevel: bool,
     is_global: bool = False,
     parent_modname: str | None = None,
-):
-    obj, modname, classname, objname = objtree.find_path(fullname)
-    if not obj:
-        parent = ".".join(filter(None, [modname, classname])) or "<global namespace>"
-        msg = f"unknown lua object {fullname}:\n"
-        msg += f"  {parent} has no item {objname!r}\n"
-        msg += "Hint: set `lua_ls_verbose = True` in conf.py to see all objects exported by lua analyzer.\n"
-        msg += "Hint: see troubleshooting guide at https://sphinx-lua-ls.readthedocs.io/en/latest/troubleshooring.html"
-        raise sphinx.errors.ConfigError(msg)
-
-    autodoc_options = options.copy()
-    for name, value in obj.parsed_options.items():
-        if name in AutoObjectDirective.option_spec:
+) -> tuple[pathlib.Path, str, dict[str, tuple[Object, bool]]]:
+    """
+    Render a single page, return its path, contents, and submodules that need
+    pages of their own, mapped to their objects and `is_global` flags.
+
+    """
+
+    # Page options are always modified below, autodoc options only need
+    # to be copied if object overrides them.
+    page_options = page_options.copy()
+    if obj.parsed_options:
+        option_spec = AutoObjectDirective.option_spec
+        autodoc_options = options.copy()
+        for name, value in obj.parsed_options.items():
+            if (parse := option_spec.get(name)) is None:
+                raise sphinx.errors.DocumentError(
+                    f"unknown !doc option {name} in object {fullname}"
+                )
             try:
-                autodoc_options[name] = AutoObjectDirective.option_spec[name](value)
+                autodoc_options[name] = parse(value)
             except ValueError as e:
                 raise sphinx.errors.DocumentError(
                     f"invalid !doc option {name} in object {fullname}: {e}"
                 ) from None
-        else:
-            raise sphinx.errors.DocumentError(
-                f"unknown !doc option {name} in object {fullname}"
-            )
+            page_options[name] = _format_option(autodoc_options[name])
+    else:
+        autodoc_options = options
     if (
         "exclude-members" not in autodoc_options
         or autodoc_options["exclude-members"] is True
     ):
         exclude_members = set()
     else:
-        exclude_members = autodoc_options["exclude-members"].copy()
+        exclude_members = set(autodoc_options["exclude-members"])
 
-    submodules: dict[str, bool] = {}
+    submodules: dict[str, tuple[Object, bool]] = {}
 
     if depth > 0 and obj.kind == Kind.Module:
-        for child_name, child in _iter_children(obj, objtree, None, autodoc_options):
-            if child.kind != Kind.Module and not separate_members:
-                continue
+        prefix = f"{fullname}."
+        for child_name, child in _iter_children(
+            obj,
+            objtree,
+            None,
+            autodoc_options,
+            kind=None if separate_members else Kind.Module,
+        ):
             if child.is_toplevel:
                 child_fullname = child_name
                 child_is_global = True
             else:
-                child_fullname = f"{fullname}.{child_name}"
+                child_fullname = prefix + child_name
                 child_is_global = False
             exclude_members.add(child_name)
             if not mod_filter(child_fullname):
-                submodules[child_fullname] = child_is_global
-
-    autodoc_options["exclude-members"] = exclude_members
+                submodules[child_fullname] = child, child_is_global
 
-    for option_name in autodoc_options:
-        if autodoc_options[option_name] in (None, True):
-            autodoc_options[option_name] = ""
-        elif isinstance(autodoc_options[option_name], (set, list)):
-            autodoc_options[option_name] = ", ".join(
-                sorted(autodoc_options[option_name])
-            )
+    page_options["exclude-members"] = _format_option(exclude_members)
     if is_global:
-        autodoc_options["global"] = ""
-        autodoc_options["module"] = ""
+        page_options["global"] = ""
+        page_options["module"] = ""
         lname = "Global"
-    elif obj.kind:
-        lname = LuaDomain.object_types[obj.kind.value].lname.title()
     else:
-        lname = "Object"
+        lname = lnames.get(obj.kind, "Object")  # type: ignore
 
     match format:
         case "rst":
-            template = _TEMPLATE_RST
+            render = _render_rst
             title = f"{lname} ``{fullname}``"
         case "md":
-            template = _TEMPLATE_MD
+            render = _render_md
             title = f"{lname} `{fullname}`"
         case _:
             raise sphinx.errors.ConfigError(f"unknown apidoc format {format}")
 
-    page = template.render(
+    page = render(
         title=title,
         fullname=fullname,
-        options=autodoc_options,
+        options=page_options,
         submodules=submodules,
         parent_modname=parent_modname or "None",
     )
@@ -231,35 +300,51 @@ def _generate(
         filepath = dir / f"index.{format}"
     else:
         filepath = dir / f"{_mangle_filename(fullname)}.{format}"
-    if not filepath.exists() or filepath.read_text() != page:
-        filepath.write_text(page)
-    files.add(str(filepath))
-
-    for child_fullname, child_is_global in submodules.items():
-        _generate(
-            domain=domain,
-            dir=dir,
-            fullname=child_fullname,
-            objtree=objtree,
-            depth=depth - 1,
-            options=options,
-            mod_filter=mod_filter,
-            files=files,
-            format=format,
-            separate_members=separate_members,
-            is_toplevel=False,
-            is_global=child_is_global,
-            parent_modname=fullname if child_is_global else parent_modname,
-        )
+
+    return filepath, page, submodules
+
+
+def _format_option(value: Any) -> str:
+    if value in (None, True):
+        return ""
+    elif isinstance(value, (set, list)):
+        return ", ".join(sorted(value))
+    else:
+        return value
+
+
+def _write_if_changed(filepath: pathlib.Path, content: bytes):
+    # Don't touch files that didn't change, so that Sphinx doesn't re-read them.
+    path = str(filepath)
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    try:
+        stat = os.stat(path)
+        if stat.st_size == len(content):
+            if _PAGE_DIGESTS.get(path) == (stat.st_size, stat.st_mtime_ns, digest):
+                return
+            if filepath.read_bytes() == content:
+                _PAGE_DIGESTS[path] = (stat.st_size, stat.st_mtime_ns, digest)
+                return
+    except FileNotFoundError:
+        pass
+    filepath.write_bytes(content)
+    stat = os.stat(path)
+    _PAGE_DIGESTS[path] = (stat.st_size, stat.st_mtime_ns, digest)
 
 
 def _make_case_sensitive(dir: pathlib.Path) -> bool:
     dir.mkdir(parents=True, exist_ok=True)
 
+    stat = os.stat(dir)
+    key = (stat.st_dev, stat.st_ino)
+    if key in _CASE_SENSITIVE_DIRS:
+        return True
+
     if not _fs_is_case_insensitive(dir):
+        _CASE_SENSITIVE_DIRS.add(key)
         return True
 
-    if sys.platform == "win32":
+    if sys.platform == "win32" and key not in _FSUTIL_FAILED_DIRS:
         _logger.info(
             "trying to switch directory to case-insensitive mode: %s",
             dir,
@@ -270,34 +355,44 @@ def _make_case_sensitive(dir: pathlib.Path) -> bool:
             ["fsutil.exe", "file", "setCaseSensitiveInfo", dir, "enable"]
         )
 
-        if retcode != 0:
+        if retcode != 0 or _fs_is_case_insensitive(dir):
+            _FSUTIL_FAILED_DIRS.add(key)
             return False
-        else:
-            return not _fs_is_case_insensitive(dir)
+
+        _CASE_SENSITIVE_DIRS.add(key)
+        return True
 
     return False
 
 
 def _fs_is_case_insensitive(dir: pathlib.Path) -> bool:
-    f1 = dir / "__sphinx_lua_ls_CASE_SENSITIVITY_TEST"
-    f2 = dir / "__sphinx_lua_ls_case_sensitivity_test"
-
-    if f1.exists():
-        os.remove(f1)
-    if f2.exists():
-        os.remove(f2)
-
+    # Unique file name means that we don't need to clean up after interrupted
+    # probes, and that concurrent builds don't interfere with each other.
+    fd, path = tempfile.mkstemp(
+        prefix="__sphinx_lua_ls_case_sensitivity_test_", dir=dir
+    )
+    os.close(fd)
     try:
-        f1.touch()
-        return f2.exists()
+        dirname, basename = os.path.split(path)
+        return os.path.exists(os.path.join(dirname, basename.upper()))
     finally:
-        if f1.exists():
-            os.remove(f1)
-        if f2.exists():
-            os.remove(f2)
+        os.unlink(path)
+
+
+_SAFE_CHARS = frozenset(string.ascii_letters + string.digits + "_.-~()[]")
+
+#: Translation table for ASCII strings, equivalent to `urllib.parse.quote`
+#: with `!` instead of `%`.
+_MANGLE_TABLE = {
+    i: chr(i) if chr(i) in _SAFE_CHARS else f"!{i:02X}" for i in range(128)
+}
 
 
+@functools.lru_cache(maxsize=4096)
 def _mangle_filename(name: str) -> str:
     # We don't want to urlencode the file name because we'll end up with double
     # encoding in all references. So, we use `!` instead of `%`.
-    return urllib.parse.quote(normalize_name(name), safe="()[]").replace("%", "!")
+    name = normalize_name(name)
+    if name.isascii():
+        return name.translate(_MANGLE_TABLE)
+    return urllib.parse.quote(name, safe="()[]").replace("%", "!")
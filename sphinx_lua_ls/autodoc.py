@@ -9,6 +9,7 @@ import dataclasses
 import functools
 import math
 import os
+import weakref
 from typing import Any, Callable, ClassVar, Type, cast
 
 import docutils.nodes
@@ -30,40 +31,54 @@ from sphinx_lua_ls.objtree import Kind, Object, Visibility
 # Alias files and types are not properly reported sometimes.
 _FIX_FLAKY_ALIAS_TESTS = "_LUA_LS_FIX_FLAKY_ALIAS_TESTS" in os.environ
 
-
-def _iter_children(
-    obj: Object,
-    objtree: Object,
-    parent: Object | None,
-    options: dict[str, Any],
-    include_globals: bool = True,
-):
-    children = list(obj.children.items())
-
-    if obj.kind == Kind.Module and (globals := options.get("globals")):
-        if globals is True:
-            filter_globals = lambda _: True
-        else:
-            filter_globals = lambda name: name in globals
-
-        if include_globals and obj.kind == Kind.Module:
-            for name, child in objtree.children.items():
-                if (
-                    not child.is_foreign
-                    and child.kind != Kind.Module
-                    and filter_globals(name)
-                    and obj.files & child.files
-                ):
-                    children.append((name, child))
-
-    if obj.kind == Kind.Module:
-        order = (
-            options.get("module-member-order")
-            or options.get("member-order")
-            or "bysource"
-        )
-    else:
-        order = options.get("member-order") or "bysource"
+# Member categories that need to be explicitly enabled in autodoc options.
+_UNDOC = 1 << 0
+_PRIVATE = 1 << 1
+_PROTECTED = 1 << 2
+_PACKAGE = 1 << 3
+_SPECIAL = 1 << 4
+_INHERITED = 1 << 5
+
+_VISIBILITY_CATEGORIES = {
+    Visibility.Private: _PRIVATE,
+    Visibility.Protected: _PROTECTED,
+    Visibility.Package: _PACKAGE,
+}
+
+
+#: Children of objects sorted by member order, and names of members inherited
+#: by classes. Object tree doesn't change after it's parsed, so these are
+#: computed once per object and shared between all directives.
+_SORTED_CHILDREN: weakref.WeakKeyDictionary[
+    Object, dict[str, list[tuple[str, Object]]]
+] = weakref.WeakKeyDictionary()
+_INHERITED_NAMES: weakref.WeakKeyDictionary[Object, frozenset[str]] = (
+    weakref.WeakKeyDictionary()
+)
+
+#: Member categories of objects, not including ones that depend on member's name
+#: or its parent.
+_CATEGORIES: weakref.WeakKeyDictionary[Object, int] = weakref.WeakKeyDictionary()
+
+#: Parent objects for module and class names, for every object tree.
+_PARENTS: weakref.WeakKeyDictionary[
+    Object, dict[tuple[str | None, str], Object | None]
+] = weakref.WeakKeyDictionary()
+
+#: Section titles repeat across modules, usually they're just the defaults.
+_normalize_name = functools.lru_cache(maxsize=1024)(docutils.nodes.fully_normalize_name)
+
+
+def _sorted_children(obj: Object, order: str) -> list[tuple[str, Object]]:
+    cache = _SORTED_CHILDREN.setdefault(obj, {})
+    if order not in cache:
+        cache[order] = _sort_children(list(obj.children.items()), order)
+    return cache[order]
+
+
+def _sort_children(
+    children: list[tuple[str, Object]], order: str
+) -> list[tuple[str, Object]]:
     match order:
         case "alphabetical":
             children.sort(key=lambda ch: ch[0].lower())
@@ -89,24 +104,97 @@ def _iter_children(
             )
         case _:
             raise RuntimeError(f"unknown member order {order}")
+    return children
 
-    inherited_names = set()
 
+def _inherited_names(objtree: Object, parent: Object | None) -> frozenset[str]:
     if (
-        parent
-        and parent.kind == Kind.Class
-        and isinstance(parent, sphinx_lua_ls.objtree.Class)
+        not parent
+        or parent.kind != Kind.Class
+        or not isinstance(parent, sphinx_lua_ls.objtree.Class)
     ):
+        return frozenset()
+    if parent not in _INHERITED_NAMES:
+        names = set()
         for base in objtree.find_all_bases(parent):
-            inherited_names.update(base.children.keys())
+            names.update(base.children.keys())
+        _INHERITED_NAMES[parent] = frozenset(names)
+    return _INHERITED_NAMES[parent]
+
+
+def _object_categories(obj: Object) -> int:
+    """
+    Get member categories that depend only on the object itself.
+
+    """
+
+    if (categories := _CATEGORIES.get(obj)) is None:
+        categories = _VISIBILITY_CATEGORIES.get(obj.visibility, 0)  # type: ignore
+        if not obj.parsed_docstring:
+            categories |= _UNDOC
+        if parsed_options := obj.parsed_options:
+            if "private" in parsed_options:
+                categories |= _PRIVATE
+            if "protected" in parsed_options:
+                categories |= _PROTECTED
+            if "package" in parsed_options:
+                categories |= _PACKAGE
+        _CATEGORIES[obj] = categories
+    return categories
+
+
+def _iter_children(
+    obj: Object,
+    objtree: Object,
+    parent: Object | None,
+    options: dict[str, Any],
+    include_globals: bool = True,
+    kind: Kind | None = None,
+):
+    if obj.kind == Kind.Module:
+        order = (
+            options.get("module-member-order")
+            or options.get("member-order")
+            or "bysource"
+        )
+    else:
+        order = options.get("member-order") or "bysource"
+
+    globals_children = []
+
+    # Globals are never modules.
+    if (
+        obj.kind == Kind.Module
+        and kind != Kind.Module
+        and (globals := options.get("globals"))
+    ):
+        if globals is True:
+            filter_globals = lambda _: True
+        else:
+            filter_globals = lambda name: name in globals
+
+        if include_globals and obj.kind == Kind.Module:
+            for name, child in objtree.children.items():
+                if (
+                    not child.is_foreign
+                    and child.kind != Kind.Module
+                    and filter_globals(name)
+                    and obj.files & child.files
+                ):
+                    globals_children.append((name, child))
+
+    if globals_children:
+        children = _sort_children(list(obj.children.items()) + globals_children, order)
+    else:
+        children = _sorted_children(obj, order)
+
+    if kind is not None:
+        children = [(name, child) for name, child in children if child.kind == kind]
+
+    inherited_names = _inherited_names(objtree, parent)
 
     include_normal = False
-    include_undoc = False
-    include_private = False
-    include_protected = False
-    include_package = False
-    include_special = False
-    include_inherited = False
+    allowed = 0
 
     include = set()
 
@@ -119,77 +207,33 @@ def _iter_children(
             include_normal = True
         else:
             include.update(members)
-    if undoc := options.get("undoc-members"):
-        if undoc is True:
-            include_undoc = True
-        else:
-            include.update(undoc)
-    if private := options.get("private-members"):
-        if private is True:
-            include_private = True
-        else:
-            include.update(private)
-    if protected := options.get("protected-members"):
-        if protected is True:
-            include_protected = True
-        else:
-            include.update(protected)
-    if package := options.get("package-members"):
-        if package is True:
-            include_package = True
-        else:
-            include.update(package)
-    if special := options.get("special-members"):
-        if special is True:
-            include_special = True
-        else:
-            include.update(special)
-    if inherited := options.get("inherited-members"):
-        if inherited is True:
-            include_inherited = True
-        else:
-            include.update(inherited)
+    for option, category in [
+        ("undoc-members", _UNDOC),
+        ("private-members", _PRIVATE),
+        ("protected-members", _PROTECTED),
+        ("package-members", _PACKAGE),
+        ("special-members", _SPECIAL),
+        ("inherited-members", _INHERITED),
+    ]:
+        if value := options.get(option):
+            if value is True:
+                allowed |= category
+            else:
+                include.update(value)
 
     for name, child in children:
         if name in exclude:
             continue
         if name not in include and not child.is_toplevel:
-            is_undoc = not child.parsed_docstring
-            if is_undoc and not include_undoc:
+            categories = _object_categories(child)
+            if name.startswith("__"):
+                categories |= _SPECIAL
+            if name in inherited_names:
+                categories |= _INHERITED
+            if categories & ~allowed:
+                # Member is in a category that wasn't enabled.
                 continue
-            is_private = (
-                child.visibility == Visibility.Private
-                or "private" in child.parsed_options
-            )
-            if is_private and not include_private:
-                continue
-            is_protected = (
-                child.visibility == Visibility.Protected
-                or "protected" in child.parsed_options
-            )
-            if is_protected and not include_protected:
-                continue
-            is_package = (
-                child.visibility == Visibility.Package
-                or "package" in child.parsed_options
-            )
-            if is_package and not include_package:
-                continue
-            is_special = name.startswith("__")
-            if is_special and not include_special:
-                continue
-            is_inherited = name in inherited_names
-            if is_inherited and not include_inherited:
-                continue
-            if (
-                not is_undoc
-                and not is_private
-                and not is_protected
-                and not is_package
-                and not is_special
-                and not is_inherited
-                and not include_normal
-            ):
+            if not categories and not include_normal:
                 continue
         yield name, child
 
@@ -241,6 +285,17 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
     )
     option_spec.update(sphinx_lua_ls.domain.LuaObject.option_spec)
 
+    #: Names of methods that render objects of each kind.
+    _RENDERERS: ClassVar[dict[Kind, str]] = {
+        Kind.Data: "_render_data",
+        Kind.Table: "_render_table",
+        Kind.Module: "_render_module",
+        Kind.Function: "_render_function",
+        Kind.Class: "_render_class",
+        Kind.Alias: "_render_alias",
+        Kind.Enum: "_render_enum",
+    }
+
     def render(
         self,
         root: Object,
@@ -272,35 +327,9 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
             msg += f"use lua:auto{what} instead"
             raise self.error(msg)
 
-        match root.kind:
-            case Kind.Data:
-                return self._render_data(
-                    root, name, top_level, doctype_override, signature_override
-                )
-            case Kind.Table:
-                return self._render_table(
-                    root, name, top_level, doctype_override, signature_override
-                )
-            case Kind.Module:
-                return self._render_module(
-                    root, name, top_level, doctype_override, signature_override
-                )
-            case Kind.Function:
-                return self._render_function(
-                    root, name, top_level, doctype_override, signature_override
-                )
-            case Kind.Class:
-                return self._render_class(
-                    root, name, top_level, doctype_override, signature_override
-                )
-            case Kind.Alias:
-                return self._render_alias(
-                    root, name, top_level, doctype_override, signature_override
-                )
-            case Kind.Enum:
-                return self._render_enum(
-                    root, name, top_level, doctype_override, signature_override
-                )
+        return getattr(self, self._RENDERERS[root.kind])(
+            root, name, top_level, doctype_override, signature_override
+        )
 
     def _render_module(
         self,
@@ -437,6 +466,8 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
     def render_docs(
         self, path: str, line: int, docs: str, titles=False
     ) -> list[docutils.nodes.Node]:
+        if not docs or docs.isspace():
+            return []
         lines = docs.splitlines()
         items = [(path, line)] * len(lines)
         content = docutils.statemachine.StringList(lines, items=items, source=path)
@@ -460,56 +491,7 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
             options = self.orig_options.copy()
             options.pop("module", None)
         else:
-            options = {}
-            for key in [
-                "member-order",
-                "no-member-order",
-                "module-member-order",
-                "no-module-member-order",
-                "recursive",
-                "no-recursive",
-                "no-index",
-                "no-no-index",
-                "no-index-entry",
-                "no-no-index-entry",
-                "no-contents-entry",
-                "no-no-contents-entry",
-                "inherited-members-table",
-                "no-inherited-members-table",
-                "class-doc-from",
-                "no-class-doc-from",
-                "class-signature",
-                "no-class-signature",
-                "annotate-require",
-                "no-annotate-require",
-                "require-function-name",
-                "no-require-function-name",
-                "require-separator",
-                "no-require-separator",
-            ]:
-                if key in self.orig_options:
-                    options[key] = self.orig_options[key]
-            if "recursive" in self.orig_options:
-                for key in [
-                    "members",
-                    "globals",
-                    "undoc-members",
-                    "private-members",
-                    "protected-members",
-                    "package-members",
-                    "special-members",
-                    "inherited-members",
-                    "using",
-                ]:
-                    if key in self.orig_options:
-                        if self.orig_options[key] is True:
-                            options[key] = self.orig_options[key]
-                        elif (
-                            self.orig_options[key] and self.orig_options[key][0] == "+"
-                        ):
-                            options[key] = self.orig_options[key]
-                            if f"no-{key}" in self.orig_options:
-                                options[f"no-{key}"] = self.orig_options[f"no-{key}"]
+            options = self._child_options.copy()
 
         match root.visibility:
             case Visibility.Private:
@@ -525,18 +507,19 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
         if root.is_deprecated:
             options["deprecated"] = ""
 
-        for option, value in root.parsed_options.items():
-            if option in AutoObjectDirective.option_spec:
+        if root.parsed_options:
+            option_spec = AutoObjectDirective.option_spec
+            for option, value in root.parsed_options.items():
+                if (parse := option_spec.get(option)) is None:
+                    raise self.error(
+                        f"unknown !doc option {option} in object {self.arguments[0]}"
+                    )
                 try:
-                    options[option] = AutoObjectDirective.option_spec[option](value)
+                    options[option] = parse(value)
                 except ValueError as e:
                     raise self.error(
                         f"invalid !doc option {option} in object {self.arguments[0]}: {e}"
                     ) from None
-            else:
-                raise self.error(
-                    f"unknown !doc option {option} in object {self.arguments[0]}"
-                )
 
         if root.using:
             options.setdefault("using", []).extend(
@@ -562,6 +545,65 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
             signature_override=signature_override,
         )
 
+    @functools.cached_property
+    def _child_options(self) -> dict[str, Any]:
+        """
+        Options that are passed from this directive to directives that render
+        its members. They are the same for all members, so we only collect
+        them once.
+
+        """
+
+        options = {}
+        for key in [
+            "member-order",
+            "no-member-order",
+            "module-member-order",
+            "no-module-member-order",
+            "recursive",
+            "no-recursive",
+            "no-index",
+            "no-no-index",
+            "no-index-entry",
+            "no-no-index-entry",
+            "no-contents-entry",
+            "no-no-contents-entry",
+            "inherited-members-table",
+            "no-inherited-members-table",
+            "class-doc-from",
+            "no-class-doc-from",
+            "class-signature",
+            "no-class-signature",
+            "annotate-require",
+            "no-annotate-require",
+            "require-function-name",
+            "no-require-function-name",
+            "require-separator",
+            "no-require-separator",
+        ]:
+            if key in self.orig_options:
+                options[key] = self.orig_options[key]
+        if "recursive" in self.orig_options:
+            for key in [
+                "members",
+                "globals",
+                "undoc-members",
+                "private-members",
+                "protected-members",
+                "package-members",
+                "special-members",
+                "inherited-members",
+                "using",
+            ]:
+                if key in self.orig_options:
+                    if self.orig_options[key] is True:
+                        options[key] = self.orig_options[key]
+                    elif self.orig_options[key] and self.orig_options[key][0] == "+":
+                        options[key] = self.orig_options[key]
+                        if f"no-{key}" in self.orig_options:
+                            options[f"no-{key}"] = self.orig_options[f"no-{key}"]
+        return options
+
     @property
     def objtree(self) -> Object:
         return self.lua_domain.objtree
@@ -571,8 +613,13 @@ class AutodocUtilsMixin(sphinx_lua_ls.domain.LuaContextManagerMixin):
         modname = self.env.ref_context.get("lua:module", None)
         classname = self.env.ref_context.get("lua:class", None)
         if classname:
-            basepath = ".".join(filter(None, [modname, classname]))
-            return self.objtree.find(basepath)
+            # Members of the same class all look up the same parent.
+            parents = _PARENTS.setdefault(self.objtree, {})
+            key = (modname, classname)
+            if key not in parents:
+                basepath = ".".join(filter(None, [modname, classname]))
+                parents[key] = self.objtree.find(basepath)
+            return parents[key]
         else:
             return None
 
@@ -752,42 +799,23 @@ class LuaFunction(AutodocObjectMixin, sphinx_lua_ls.domain.LuaFunction):
             field_list = docutils.nodes.field_list()
             content_node += field_list
 
-        for i, param in enumerate(self.root.params):
-            if param.docstring and "\n" in param.docstring:
-                continue
-            if param.parsed_docstring and not (i == 0 and param.name == "self"):
-                if param.type:
-                    obj = self.objtree.find(param.type)
-                    if obj and obj.docstring == param.docstring:
-                        continue
+        self._render_params(field_list, self.root.params, "param", "type")
+        self._render_params(field_list, self.root.returns, "return", "rtype")
 
-                field_body = docutils.nodes.field_body("")
-                field_body += self.render_docs(
-                    str(
-                        self.root.docstring_file
-                        or f"<docstring for {self.arguments[0]}, param {param.name}>"
-                    ),
-                    self.root.line or 0,
-                    param.parsed_docstring,
-                )
-                field_list += docutils.nodes.field(
-                    "",
-                    docutils.nodes.field_name("", "param " + (param.name or "_")),
-                    field_body,
-                )
-            if param.type:
-                field_list += docutils.nodes.field(
-                    "",
-                    docutils.nodes.field_name(
-                        "", "type " + (param.name or f"_{i + 1}")
-                    ),
-                    docutils.nodes.field_body("", docutils.nodes.Text(param.type)),
-                )
-
-        for i, param in enumerate(self.root.returns):
+    def _render_params(
+        self,
+        field_list: docutils.nodes.field_list,
+        params: list[sphinx_lua_ls.objtree.Param],
+        doc_field: str,
+        type_field: str,
+    ):
+        is_params = doc_field == "param"
+        for i, param in enumerate(params):
             if param.docstring and "\n" in param.docstring:
                 continue
-            if param.parsed_docstring:
+            if param.parsed_docstring and not (
+                is_params and i == 0 and param.name == "self"
+            ):
                 if param.type:
                     obj = self.objtree.find(param.type)
                     if obj and obj.docstring == param.docstring:
@@ -802,18 +830,20 @@ class LuaFunction(AutodocObjectMixin, sphinx_lua_ls.domain.LuaFunction):
                     self.root.line or 0,
                     param.parsed_docstring,
                 )
+                if is_params:
+                    doc_name = param.name or "_"
+                else:
+                    doc_name = param.name or f"_{i + 1}"
                 field_list += docutils.nodes.field(
                     "",
-                    docutils.nodes.field_name(
-                        "", "return " + (param.name or f"_{i + 1}")
-                    ),
+                    docutils.nodes.field_name("", f"{doc_field} {doc_name}"),
                     field_body,
                 )
             if param.type:
                 field_list += docutils.nodes.field(
                     "",
                     docutils.nodes.field_name(
-                        "", "rtype " + (param.name or f"_{i + 1}")
+                        "", f"{type_field} {param.name or f'_{i + 1}'}"
                     ),
                     docutils.nodes.field_body("", docutils.nodes.Text(param.type)),
                 )
@@ -1007,7 +1037,7 @@ class LuaModule(AutodocDirectiveMixin, sphinx_lua_ls.domain.LuaModule):
             nodes.append(index)
 
             title = self.options.get("index-title", None) or "Index"
-            index["name"] = docutils.nodes.fully_normalize_name(title)
+            index["name"] = _normalize_name(title)
             index["names"].append(index["name"])
             index += docutils.nodes.title("", title)
             self.state.document.note_implicit_target(index, index)
@@ -1039,7 +1069,7 @@ class LuaModule(AutodocDirectiveMixin, sphinx_lua_ls.domain.LuaModule):
 
                     api_docs = docutils.nodes.section("", names=[])
 
-                    api_docs["name"] = docutils.nodes.fully_normalize_name(title)
+                    api_docs["name"] = _normalize_name(title)
                     api_docs["names"].append(api_docs["name"])
                     api_docs += docutils.nodes.title("", title)
                     self.state.document.note_implicit_target(api_docs, api_docs)
@@ -1053,7 +1083,7 @@ class LuaModule(AutodocDirectiveMixin, sphinx_lua_ls.domain.LuaModule):
                 nodes.append(api_docs)
             elif "index-table" in self.options or "title" in self.options:
                 title = self.options.get("title", None) or "Api reference"
-                api_docs["name"] = docutils.nodes.fully_normalize_name(title)
+                api_docs["name"] = _normalize_name(title)
                 api_docs["names"].append(api_docs["name"])
                 api_docs.insert(0, docutils.nodes.title("", title))
                 self.state.document.note_implicit_target(api_docs, api_docs)
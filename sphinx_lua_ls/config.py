@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import dataclasses
+import fnmatch
+import functools
+import hashlib
+import os
 import pathlib
+import pickle
 import re
 import sys
+import tempfile
 import typing as _t
 from dataclasses import dataclass
 
@@ -13,12 +19,41 @@ from sphinx.util import logging
 
 import sphinx_lua_ls.autodoc
 import sphinx_lua_ls.domain
+from sphinx_lua_ls._version import __version__
 
 _logger = logging.getLogger("sphinx_lua_ls")
 
 T = _t.TypeVar("T")
 A = _t.ParamSpec("A")
 
+_VERSION_RE = re.compile(r"\d+(?:\.\d+)*")
+
+#: All config values that affect :class:`LuaDomainConfig`.
+_CONFIG_KEYS = (
+    "lua_ls_backend",
+    "lua_ls_project_root",
+    "lua_ls_project_directories",
+    "lua_ls_auto_install",
+    "lua_ls_auto_install_location",
+    "lua_ls_min_version",
+    "lua_ls_max_version",
+    "lua_ls_skip_versions",
+    "lua_ls_lua_version",
+    "lua_ls_default_options",
+    "lua_ls_apidoc_roots",
+    "lua_ls_apidoc_default_options",
+    "lua_ls_apidoc_max_depth",
+    "lua_ls_apidoc_ignored_modules",
+    "lua_ls_apidoc_format",
+    "lua_ls_apidoc_separate_members",
+    "lua_ls_class_default_function_name",
+    "lua_ls_class_default_force_non_colon",
+    "lua_ls_class_default_force_return_self",
+    "lua_ls_maximum_signature_line_length",
+    "lua_ls_verbose",
+    "maximum_signature_line_length",
+)
+
 
 @dataclass
 class LuaDomainConfig:
@@ -34,7 +69,9 @@ class LuaDomainConfig:
     default_options: dict[str, _t.Any] = dataclasses.field(default_factory=dict)
     apidoc_default_options: dict[str, _t.Any] = dataclasses.field(default_factory=dict)
     apidoc_max_depth: int = 4
-    apidoc_ignored_modules: set[str] = dataclasses.field(default_factory=set)
+    apidoc_ignored_modules: frozenset[str] = dataclasses.field(
+        default_factory=frozenset
+    )
     apidoc_format: _t.Literal["rst", "md"] = "rst"
     apidoc_separate_members: bool = False
     apidoc_roots: dict[str, dict[str, _t.Any]] = dataclasses.field(default_factory=dict)
@@ -47,16 +84,50 @@ class LuaDomainConfig:
 
 def _type(name: str, value, types: _t.Type[T] | tuple[_t.Type[T], ...]) -> T:
     if not isinstance(value, types):
-        if not isinstance(types, tuple):
-            types = (types,)
-        raise ConfigError(
-            f"{name} should be {' or '.join(map(str, types))}, got {type(value)} instead"
-        )
+        _type_error(name, value, types)
+    return value
+
+
+def _as_str(name: str, value) -> str:
+    if not isinstance(value, str):
+        _type_error(name, value, str)
+    return value
+
+
+def _as_int(name: str, value) -> int:
+    if not isinstance(value, int):
+        _type_error(name, value, int)
+    return value
+
+
+def _as_bool(name: str, value) -> bool:
+    if not isinstance(value, bool):
+        _type_error(name, value, bool)
+    return value
+
+
+def _as_dict(name: str, value) -> dict[_t.Any, _t.Any]:
+    if not isinstance(value, dict):
+        _type_error(name, value, dict)
     return value
 
 
+def _as_list(name: str, value) -> list[_t.Any]:
+    if not isinstance(value, list):
+        _type_error(name, value, list)
+    return value
+
+
+def _type_error(name: str, value, types: type | tuple[type, ...]) -> _t.NoReturn:
+    if not isinstance(types, tuple):
+        types = (types,)
+    raise ConfigError(
+        f"{name} should be {' or '.join(map(str, types))}, got {type(value)} instead"
+    )
+
+
 def _str_choices(name: str, value, choices: list[str]) -> str:
-    value = _type(name, value, str)
+    value = _as_str(name, value)
     if value not in choices:
         raise ConfigError(
             f"{name} should be one of {', '.join(map(repr, choices))}, got {value!r} instead"
@@ -65,8 +136,8 @@ def _str_choices(name: str, value, choices: list[str]) -> str:
 
 
 def _version(name: str, value) -> str:
-    _type(name, value, str)
-    if not re.match(r"\d+(\.\d+)*", value):
+    _as_str(name, value)
+    if not _VERSION_RE.fullmatch(value):
         raise ConfigError(f"incorrect {name}: {value}")
     return value
 
@@ -74,11 +145,35 @@ def _version(name: str, value) -> str:
 def _path(name: str, value, root: str | pathlib.Path) -> pathlib.Path:
     _type(name, value, (str, pathlib.Path))
     try:
-        return pathlib.Path(root, value).expanduser().resolve()
+        return _resolve_path(os.fspath(root), os.fspath(value))
     except ValueError as e:
         raise ConfigError(f"incorrect lua_ls_project_root: {e}") from None
 
 
+#: Paths resolved while parsing config: `(root, value) -> resolved path`.
+#: They depend on symlinks and home directory, so they're re-checked
+#: before reusing a previously parsed config.
+_resolved_paths: dict[tuple[str, str], pathlib.Path] = {}
+
+
+def _resolve_path(root: str, value: str) -> pathlib.Path:
+    key = (root, value)
+    if key not in _resolved_paths:
+        _resolved_paths[key] = _real_path(root, value)
+    return _resolved_paths[key]
+
+
+def _real_path(root: str, value: str) -> pathlib.Path:
+    path = os.path.join(root, value)
+    return pathlib.Path(os.path.realpath(os.path.expanduser(path)))
+
+
+def _paths_changed(paths: dict[tuple[str, str], pathlib.Path] | None) -> bool:
+    return paths is None or any(
+        _real_path(root, value) != path for (root, value), path in paths.items()
+    )
+
+
 def _list(
     name: str,
     value,
@@ -88,44 +183,53 @@ def _list(
 ) -> list[T]:
     if value is None:
         value = []
-    _type(name, value, list)
+    _as_list(name, value)
     return [checker(f"{name}[{i}]", v, *args, **kwargs) for i, v in enumerate(value)]
 
 
 def _options(name: str, value) -> dict[str, _t.Any]:
     if value is None:
         value = {}
-    _type(name, value, dict)
+    _as_dict(name, value)
     new_value = {}
     for key, option in value.items():
-        parser = sphinx_lua_ls.autodoc.AutoObjectDirective.option_spec.get(key, None)
-        if parser is None:
+        if key not in sphinx_lua_ls.autodoc.AutoObjectDirective.option_spec:
             raise ConfigError(f"unknown option in {name}: :{key}:")
         if key not in sphinx_lua_ls.domain.GLOBAL_OPTIONS:
             raise ConfigError(
                 f"incorrect option in {name}: :{key}: can't be set from config"
             )
-        _type(f"{name}[{key!r}]", option, str)
+        _as_str(f"{name}[{key!r}]", option)
         try:
-            new_value[key] = parser(option)
+            parsed = _parse_option(key, option)
         except Exception as e:
             raise ConfigError(f"incorrect {name}[{key!r}]: {e}") from None
+        # Parsed values are cached, make sure nobody mutates them.
+        new_value[key] = parsed.copy() if isinstance(parsed, list) else parsed
     return new_value
 
 
+@functools.lru_cache(maxsize=512)
+def _parse_option(key: str, option: str) -> _t.Any:
+    return sphinx_lua_ls.autodoc.AutoObjectDirective.option_spec[key](option)
+
+
 def _api_roots(
     name: str,
     value,
     root: str | pathlib.Path,
     max_depth: int,
     options: dict[str, _t.Any],
-    excludes: set[str],
+    excludes: frozenset[str],
     format: str,
     separate_members: bool,
 ) -> dict[str, dict[str, _t.Any]]:
     if value is None:
         value = {}
-    _type(name, value, dict)
+    _as_dict(name, value)
+    # Paths are compared as strings, normalize case for case-insensitive systems.
+    root_str = os.path.normcase(os.fspath(root))
+    root_prefix = os.path.join(root_str, "")
     new_value = {}
     for mod in value:
         api_root = value[mod]
@@ -137,16 +241,18 @@ def _api_roots(
         new_api_root["path"] = _path(
             f"{name}[{mod!r}]['path']", api_root.pop("path", None), root
         )
-        if not new_api_root["path"].is_relative_to(root):
+        path = os.path.normcase(os.fspath(new_api_root["path"]))
+        if path != root_str and not path.startswith(root_prefix):
             raise ConfigError(
                 f"api root {name}[{mod!r}] lays outside of src root: {str(new_api_root['path'])}"
             )
-        new_api_root["options"] = options.copy()
-        new_api_root["options"].update(
-            _options(f"{name}[{mod!r}]['options']", api_root.pop("options", None))
+        overrides = _options(
+            f"{name}[{mod!r}]['options']", api_root.pop("options", None)
         )
-        new_api_root["max_depth"] = _type(
-            f"{name}[{mod!r}]['max_depth']", api_root.pop("max_depth", max_depth), int
+        # Default options are shared between api roots, don't mutate them.
+        new_api_root["options"] = {**options, **overrides} if overrides else options
+        new_api_root["max_depth"] = _as_int(
+            f"{name}[{mod!r}]['max_depth']", api_root.pop("max_depth", max_depth)
         )
         new_api_root["ignored_modules"] = _excludes(
             f"{name}[{mod!r}]['ignored_modules']",
@@ -155,10 +261,9 @@ def _api_roots(
         new_api_root["format"] = _str_choices(
             f"{name}[{mod!r}]['format']", api_root.pop("format", format), ["rst", "md"]
         )
-        new_api_root["separate_members"] = _type(
+        new_api_root["separate_members"] = _as_bool(
             f"{name}[{mod!r}]['separate_members']",
             api_root.pop("separate_members", separate_members),
-            bool,
         )
         if api_root:
             raise ConfigError(
@@ -168,28 +273,195 @@ def _api_roots(
     return new_value
 
 
-def _excludes(name: str, value) -> set[str]:
+def _excludes(name: str, value) -> frozenset[str]:
     if value is None:
         value = []
-    _type(name, value, (list, set))
+    _type(name, value, (list, set, frozenset))
     if isinstance(value, list):
-        for i in range(len(value)):
-            _type(f"{name}[{i}]", value[i], str)
+        return frozenset(_as_str(f"{name}[{i}]", v) for i, v in enumerate(value))
+    else:
+        return frozenset(_as_str(f"{name}[{v}]", v) for v in value)
+
+
+@functools.lru_cache(maxsize=32)
+def compile_mod_filter(ignored_modules: frozenset[str]) -> _t.Callable[[str], _t.Any]:
+    # Most patterns are either plain module names or `module.*`. These
+    # can be checked without regular expressions.
+    prefixes: list[str] = []
+    names: set[str] = set()
+    globs: list[str] = []
+    for pattern in sorted(ignored_modules):
+        if not _GLOB_CHARS_RE.search(pattern):
+            names.add(pattern)
+        elif pattern.endswith(".*") and not _GLOB_CHARS_RE.search(pattern[:-1]):
+            prefixes.append(pattern[:-1])
+        else:
+            globs.append(pattern)
+
+    match = None
+    if globs:
+        # Join translated patterns under a single `(?s:...)\Z` instead of
+        # anchoring every alternative separately.
+        parts = map(_translate_glob, globs)
+        match = re.compile(
+            r"(?s:%s)\Z" % "|".join(f"(?:{part})" for part in parts)
+        ).match
+
+    if not prefixes and not names:
+        return match or _match_nothing
+    else:
+        return functools.partial(
+            _match_mod_filter, tuple(prefixes), frozenset(names), match
+        )
+
+
+_GLOB_CHARS_RE = re.compile(r"[*?\[]")
+
+
+def _match_mod_filter(
+    prefixes: tuple[str, ...],
+    names: frozenset[str],
+    match: _t.Callable[[str], _t.Any] | None,
+    s: str,
+) -> bool:
+    return (
+        s.startswith(prefixes)
+        or s in names
+        or (match is not None and match(s) is not None)
+    )
+
+
+def _translate_glob(pattern: str) -> str:
+    translated = fnmatch.translate(pattern)
+    if translated.startswith("(?s:") and translated.endswith(r")\Z"):
+        return translated[4:-3]
     else:
-        for v in value:
-            _type(f"{name}[{v}]", v, str)
-    return set(value)
+        return f"(?:{translated})"
 
 
-def set_options(app: sphinx.application.Sphinx):
+def _match_nothing(s: str) -> bool:
+    return False
+
+
+def set_options(app: sphinx.application.Sphinx, domain: sphinx_lua_ls.domain.LuaDomain):
     config = app.config
 
+    # Config is stored in the pickled environment, so we only need to re-parse it
+    # if relevant config values were changed since the previous build.
+    # If environment was discarded, we still can load config from the cache file.
+    config_key = hashlib.blake2b(
+        repr(
+            (__version__, str(app.confdir), [config[key] for key in _CONFIG_KEYS])
+        ).encode()
+    ).digest()
+    if (
+        "config" in domain.data
+        and domain.data.get("config_key") == config_key
+        and not _paths_changed(domain.data.get("config_paths"))
+    ):
+        _logger.debug("using lua domain config from the previous build")
+    elif cached := _load_config_cache(app, config_key):
+        _logger.debug("using cached lua domain config")
+        domain.config, domain.data["config_paths"] = cached
+        domain.data["config_key"] = config_key
+    else:
+        domain.config, domain.data["config_paths"] = _parse_config(app)
+        domain.data["config_key"] = config_key
+        _save_config_cache(app, config_key, domain.config, domain.data["config_paths"])
+
+    if config["lua_ls_backend"] is None:
+        _logger.warning(
+            "Sphinx-LuaLs will use EmmyLua as the default language server since v4.0. "
+            "To keep using LuaLs, set `lua_ls_backend='luals' in your conf.py`",
+            type="lua-ls",
+        )
+
+    if domain.config.verbose:
+        app.verbosity = max(app.verbosity, 1)
+        root_logger = logging.getLogger("sphinx_lua_ls")
+        root_logger.logger.propagate = False
+        handler = logging.NewLineStreamHandler(logging.SafeEncodingWriter(sys.stdout))
+        handler.setFormatter(logging.ColorizeFormatter())
+        root_logger.logger.addHandler(handler)
+        root_logger.setLevel("DEBUG")
+
+
+def _load_config_cache(
+    app: sphinx.application.Sphinx, config_key: bytes
+) -> tuple[LuaDomainConfig, dict[tuple[str, str], pathlib.Path]] | None:
+    path = pathlib.Path(app.doctreedir, "sphinx_lua_ls.cache")
+    try:
+        with open(path, "rb") as f:
+            cached_key, domain_config, paths = pickle.load(f)
+    except Exception:
+        return None
+    if (
+        cached_key != config_key
+        or not isinstance(domain_config, LuaDomainConfig)
+        or not isinstance(paths, dict)
+        or _paths_changed(paths)
+    ):
+        return None
+    return domain_config, paths
+
+
+def _save_config_cache(
+    app: sphinx.application.Sphinx,
+    config_key: bytes,
+    domain_config: LuaDomainConfig,
+    paths: dict[tuple[str, str], pathlib.Path],
+):
+    path = pathlib.Path(app.doctreedir, "sphinx_lua_ls.cache")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, delete=False
+        ) as f:
+            pickle.dump((config_key, domain_config, paths), f)
+        os.replace(f.name, path)
+    except Exception as e:
+        _logger.debug("failed to save lua domain config cache: %s", e)
+
+
+#: Config values that only need a type check before being copied
+#: to the domain config: `(config key, domain config attribute, checker)`.
+_SCALAR_OPTIONS: tuple[tuple[str, str, _t.Callable[[str, _t.Any], _t.Any]], ...] = (
+    ("lua_ls_auto_install", "auto_install", _as_bool),
+    ("lua_ls_apidoc_max_depth", "apidoc_max_depth", _as_int),
+    ("lua_ls_apidoc_separate_members", "apidoc_separate_members", _as_bool),
+    ("lua_ls_class_default_function_name", "class_default_function_name", _as_str),
+    (
+        "lua_ls_class_default_force_non_colon",
+        "class_default_force_non_colon",
+        _as_bool,
+    ),
+    (
+        "lua_ls_class_default_force_return_self",
+        "class_default_force_return_self",
+        _as_bool,
+    ),
+    ("lua_ls_verbose", "verbose", _as_bool),
+)
+
+
+def _parse_config(
+    app: sphinx.application.Sphinx,
+) -> tuple[LuaDomainConfig, dict[tuple[str, str], pathlib.Path]]:
+    config = app.config
+
+    # Symlinks could've changed since the last time we've parsed config.
+    _resolved_paths.clear()
+
     project_root = _path(
         "lua_ls_project_root", config["lua_ls_project_root"] or "", app.confdir
     )
 
     domain_config = LuaDomainConfig(project_root=project_root)
 
+    for key, attr, checker in _SCALAR_OPTIONS:
+        if config[key] is not None:
+            setattr(domain_config, attr, checker(key, config[key]))
+
     if config["lua_ls_backend"] is not None:
         domain_config.backend = _t.cast(
             _t.Literal["emmylua", "luals", "disable"],
@@ -199,12 +471,6 @@ def set_options(app: sphinx.application.Sphinx):
                 ["luals", "emmylua", "disable"],
             ),
         )
-    else:
-        _logger.warning(
-            "Sphinx-LuaLs will use EmmyLua as the default language server since v4.0. "
-            "To keep using LuaLs, set `lua_ls_backend='luals' in your conf.py`",
-            type="lua-ls",
-        )
 
     if config["lua_ls_project_directories"] is not None:
         domain_config.project_directories = _list(
@@ -214,11 +480,6 @@ def set_options(app: sphinx.application.Sphinx):
             domain_config.project_root,
         )
 
-    if config["lua_ls_auto_install"] is not None:
-        domain_config.auto_install = _type(
-            "lua_ls_auto_install", config["lua_ls_auto_install"], bool
-        )
-
     if config["lua_ls_auto_install_location"] is not None:
         domain_config.auto_install_location = _path(
             "lua_ls_auto_install_location",
@@ -248,20 +509,21 @@ def set_options(app: sphinx.application.Sphinx):
             ["jit", "5.1", "5.2", "5.3", "5.4", "5.5"],
         )
 
-    domain_config.default_options = _options(
-        "lua_ls_default_options", config["lua_ls_default_options"]
-    )
-    domain_config.apidoc_default_options = domain_config.default_options.copy()
-    domain_config.apidoc_default_options.update(
-        _options(
-            "lua_ls_apidoc_default_options", config["lua_ls_apidoc_default_options"]
+    if config["lua_ls_default_options"] is not None:
+        domain_config.default_options = _options(
+            "lua_ls_default_options", config["lua_ls_default_options"]
         )
-    )
 
-    if config["lua_ls_apidoc_max_depth"] is not None:
-        domain_config.apidoc_max_depth = _type(
-            "lua_ls_apidoc_max_depth", config["lua_ls_apidoc_max_depth"], int
-        )
+    if config["lua_ls_apidoc_default_options"] is not None:
+        domain_config.apidoc_default_options = {
+            **domain_config.default_options,
+            **_options(
+                "lua_ls_apidoc_default_options",
+                config["lua_ls_apidoc_default_options"],
+            ),
+        }
+    else:
+        domain_config.apidoc_default_options = domain_config.default_options
 
     if config["lua_ls_apidoc_ignored_modules"] is not None:
         domain_config.apidoc_ignored_modules = _excludes(
@@ -276,50 +538,22 @@ def set_options(app: sphinx.application.Sphinx):
             ),
         )
 
-    if config["lua_ls_apidoc_separate_members"] is not None:
-        domain_config.apidoc_separate_members = _type(
-            "lua_ls_apidoc_separate_members",
-            config["lua_ls_apidoc_separate_members"],
-            bool,
-        )
-
-    domain_config.apidoc_roots = _api_roots(
-        "lua_ls_apidoc_roots",
-        config["lua_ls_apidoc_roots"],
-        app.confdir,
-        domain_config.apidoc_max_depth,
-        domain_config.apidoc_default_options,
-        domain_config.apidoc_ignored_modules,
-        domain_config.apidoc_format,
-        domain_config.apidoc_separate_members,
-    )
-
-    if config["lua_ls_class_default_function_name"] is not None:
-        domain_config.class_default_function_name = _type(
-            "lua_ls_class_default_function_name",
-            config["lua_ls_class_default_function_name"],
-            str,
-        )
-
-    if config["lua_ls_class_default_force_non_colon"] is not None:
-        domain_config.class_default_force_non_colon = _type(
-            "lua_ls_class_default_force_non_colon",
-            config["lua_ls_class_default_force_non_colon"],
-            bool,
-        )
-
-    if config["lua_ls_class_default_force_return_self"] is not None:
-        domain_config.class_default_force_return_self = _type(
-            "lua_ls_class_default_force_return_self",
-            config["lua_ls_class_default_force_return_self"],
-            bool,
+    if config["lua_ls_apidoc_roots"] is not None:
+        domain_config.apidoc_roots = _api_roots(
+            "lua_ls_apidoc_roots",
+            config["lua_ls_apidoc_roots"],
+            app.confdir,
+            domain_config.apidoc_max_depth,
+            domain_config.apidoc_default_options,
+            domain_config.apidoc_ignored_modules,
+            domain_config.apidoc_format,
+            domain_config.apidoc_separate_members,
         )
 
     if config["lua_ls_maximum_signature_line_length"] is not None:
-        domain_config.maximum_signature_line_length = _type(
+        domain_config.maximum_signature_line_length = _as_int(
             "lua_ls_maximum_signature_line_length",
             config["lua_ls_maximum_signature_line_length"],
-            int,
         )
     else:
         domain_config.maximum_signature_line_length = _type(
@@ -328,18 +562,4 @@ def set_options(app: sphinx.application.Sphinx):
             (int, type(None)),
         )
 
-    if config["lua_ls_verbose"] is not None:
-        domain_config.verbose = _type("lua_ls_verbose", config["lua_ls_verbose"], bool)
-        if domain_config.verbose:
-            app.verbosity = max(app.verbosity, 1)
-            root_logger = logging.getLogger("sphinx_lua_ls")
-            root_logger.logger.propagate = False
-            handler = logging.NewLineStreamHandler(
-                logging.SafeEncodingWriter(sys.stdout)
-            )
-            handler.setFormatter(logging.ColorizeFormatter())
-            root_logger.logger.addHandler(handler)
-            root_logger.setLevel("DEBUG")
-
-    domain = _t.cast(sphinx_lua_ls.domain.LuaDomain, app.env.get_domain("lua"))
-    domain.config = domain_config
+    return domain_config, dict(_resolved_paths)
@@ -229,64 +229,66 @@ class LuaContextManagerMixin(SphinxDirective):
         return _t.cast(LuaDomain, self.env.get_domain("lua"))
 
     def push_context(self, modname: str, classname: str, using: list[str] | None):
-        classes = self.env.ref_context.setdefault("lua:classes", [])
-        classes.append(self.env.ref_context.get("lua:class"))
+        ref_context = self.env.ref_context
+        ref_context.setdefault("lua:contexts", []).append(
+            (
+                ref_context.get("lua:class"),
+                ref_context.get("lua:module"),
+                ref_context.get("lua:using"),
+            )
+        )
         if classname:
-            self.env.ref_context["lua:class"] = classname
+            ref_context["lua:class"] = classname
         else:
-            self.env.ref_context.pop("lua:class", None)
-
-        modules = self.env.ref_context.setdefault("lua:modules", [])
-        modules.append(self.env.ref_context.get("lua:module"))
+            ref_context.pop("lua:class", None)
         if modname:
-            self.env.ref_context["lua:module"] = modname
+            ref_context["lua:module"] = modname
         else:
-            self.env.ref_context.pop("lua:module", None)
-
-        usings = self.env.ref_context.setdefault("lua:usings", [])
-        usings.append(self.env.ref_context.get("lua:using"))
+            ref_context.pop("lua:module", None)
         if using:
-            self.env.ref_context["lua:using"] = using
+            ref_context["lua:using"] = using
         else:
-            self.env.ref_context.pop("lua:using", None)
+            ref_context.pop("lua:using", None)
 
     def pop_context(self):
-        classes = self.env.ref_context.setdefault("lua:classes", [])
-        if classes:
-            self.env.ref_context["lua:class"] = classes.pop()
-        else:
-            self.env.ref_context.pop("lua:class", None)
-
-        modules = self.env.ref_context.setdefault("lua:modules", [])
-        if modules:
-            self.env.ref_context["lua:module"] = modules.pop()
-        else:
-            self.env.ref_context.pop("lua:module", None)
-
-        usings = self.env.ref_context.setdefault("lua:usings", [])
-        if usings:
-            self.env.ref_context["lua:using"] = usings.pop()
+        ref_context = self.env.ref_context
+        if contexts := ref_context.get("lua:contexts"):
+            (
+                ref_context["lua:class"],
+                ref_context["lua:module"],
+                ref_context["lua:using"],
+            ) = contexts.pop()
         else:
-            self.env.ref_context.pop("lua:using", None)
+            ref_context.pop("lua:class", None)
+            ref_context.pop("lua:module", None)
+            ref_context.pop("lua:using", None)
 
     def prepare_options(self):
         self.orig_options = self.options.copy()
-        for name, option in self.lua_domain.config.default_options.items():
-            if f"no-{name}" in self.options:
-                continue
-            if name not in self.options:
-                self.options[name] = option
-            else:
-                given_option = self.options[name]
-                if (
-                    isinstance(given_option, list)
-                    and given_option
-                    and given_option[0] == "+"
-                ):
-                    if isinstance(option, list):
-                        self.options[name] = option + given_option[1:]
-                    else:
-                        self.options[name] = given_option[1:]
+        default_options = self.lua_domain.config.default_options
+        if not default_options:
+            return
+        # Start from a copy of defaults, drop the ones disabled by `no-*` flags,
+        # then lay given options on top. Explicit options win, except for lists
+        # starting with `+`, which extend the default instead.
+        options = default_options.copy()
+        for name in self.options:
+            if name.startswith("no-"):
+                options.pop(name[3:], None)
+        for name, given_option in self.options.items():
+            if (
+                name in options
+                and isinstance(given_option, list)
+                and given_option
+                and given_option[0] == "+"
+            ):
+                option = options[name]
+                if isinstance(option, list):
+                    given_option = option + given_option[1:]
+                else:
+                    given_option = given_option[1:]
+            options[name] = given_option
+        self.options = options
 
 
 GLOBAL_OPTIONS = {
@@ -1258,6 +1260,15 @@ class LuaDomain(Domain):
     def objtree(self, objtree: sphinx_lua_ls.objtree.Object):
         self.data["objtree"] = objtree
 
+    @property
+    def lua_version(self) -> str | None:
+        """
+        Lua version from config, or the one detected by the language server.
+
+        """
+
+        return self.config.lua_version or self.data.get("objtree_runtime_version")
+
     @property
     def objects(self) -> dict[str, "LuaDomain.ObjectEntry"]:
         return self.data["objects"]
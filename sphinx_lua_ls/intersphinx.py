@@ -267,7 +267,7 @@ def resolve_std_reference(
             version = (
                 _t.cast(
                     sphinx_lua_ls.domain.LuaDomain, env.get_domain("lua")
-                ).config.lua_version
+                ).lua_version
                 or "5.4"
             )
             if version in versions:
@@ -37,6 +37,8 @@ _PathLike: _t.TypeAlias = str | os.PathLike[str]
 
 _logger = logging.getLogger("sphinx_lua_ls")
 
+_VERSION_RE = re.compile(r"(\d+\.\d+\.\d+)")
+
 
 class LuaLsError(SphinxError):
     """
@@ -471,7 +473,7 @@ def _check_version(
         _logger.debug("checking version of %a", bin_path, type="lua-ls")
         system_version_text_b = subprocess.check_output([bin_path, "--version"])
         system_version_text = system_version_text_b.decode().strip()
-        if match := re.search(r"(\d+\.\d+\.\d+)", system_version_text):
+        if match := _VERSION_RE.search(system_version_text):
             system_version = match.group(1)
             system_version_tuple = tuple(int(c) for c in system_version.split("."))
             if (
@@ -895,7 +897,7 @@ def _download_release(
 
         _logger.debug("found %s release %s", name, release.tag_name, type="lua-ls")
 
-        if match := re.search(r"(\d+\.\d+\.\d+)", release.tag_name):
+        if match := _VERSION_RE.search(release.tag_name):
             release_version = match.group(1)
             release_version_tuple = tuple(int(c) for c in release_version.split("."))
             if not (
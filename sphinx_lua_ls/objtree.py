@@ -50,6 +50,9 @@ _GROUPWISE_ORDER = {
     Kind.Module: 6,
 }
 
+_DATA_DOCTYPES = frozenset({"data", "const", "attribute"})
+_FUNCTION_DOCTYPES = frozenset({"function", "method", "classmethod", "staticmethod"})
+
 
 class Visibility(enum.Enum):
     """
@@ -321,11 +324,11 @@ class Object(DocstringMixin):
 
         """
 
-        if parsed_doctype in [None, "module"]:
+        if parsed_doctype is None or parsed_doctype == "module":
             return Kind.Module
-        elif parsed_doctype in ["data", "const", "attribute"]:
+        elif parsed_doctype in _DATA_DOCTYPES:
             return Kind.Data
-        elif parsed_doctype in ["table"]:
+        elif parsed_doctype == "table":
             return Kind.Table
         else:
             return None
@@ -456,11 +459,11 @@ class Data(Object):
     lit: str | None = None
 
     def get_kind(self, parsed_doctype: str | None) -> Kind | None:
-        if parsed_doctype in [None, "data", "const", "attribute"]:
+        if parsed_doctype is None or parsed_doctype in _DATA_DOCTYPES:
             return Kind.Data
-        elif parsed_doctype in ["table"]:
+        elif parsed_doctype == "table":
             return Kind.Table
-        elif parsed_doctype in ["module"]:
+        elif parsed_doctype == "module":
             return Kind.Module
         else:
             return None
@@ -476,11 +479,11 @@ class Table(Object):
     priority = 1
 
     def get_kind(self, parsed_doctype: str | None) -> Kind | None:
-        if parsed_doctype in [None, "table"]:
+        if parsed_doctype is None or parsed_doctype == "table":
             return Kind.Table
-        elif parsed_doctype in ["data", "const", "attribute"]:
+        elif parsed_doctype in _DATA_DOCTYPES:
             return Kind.Data
-        elif parsed_doctype in ["module"]:
+        elif parsed_doctype == "module":
             return Kind.Module
         else:
             return None
@@ -511,13 +514,7 @@ class Function(Object):
     implicit_self: bool = False
 
     def get_kind(self, parsed_doctype: str | None) -> Kind | None:
-        if parsed_doctype in [
-            None,
-            "function",
-            "method",
-            "classmethod",
-            "staticmethod",
-        ]:
+        if parsed_doctype is None or parsed_doctype in _FUNCTION_DOCTYPES:
             return Kind.Function
         else:
             return None
@@ -545,13 +542,13 @@ class Class(Object):
     constructor: Function | None = None
 
     def get_kind(self, parsed_doctype: str | None) -> Kind | None:
-        if parsed_doctype in [None, "class"]:
+        if parsed_doctype is None or parsed_doctype == "class":
             return Kind.Class
-        elif parsed_doctype in ["data", "const", "attribute"]:
+        elif parsed_doctype in _DATA_DOCTYPES:
             return Kind.Data
-        elif parsed_doctype in ["table"]:
+        elif parsed_doctype == "table":
             return Kind.Table
-        elif parsed_doctype in ["module"]:
+        elif parsed_doctype == "module":
             return Kind.Module
         else:
             return None
@@ -573,13 +570,13 @@ class Alias(Object):
     generics: list[Param] = dataclasses.field(default_factory=list)
 
     def get_kind(self, parsed_doctype: str | None) -> Kind | None:
-        if parsed_doctype in [None, "alias"]:
+        if parsed_doctype is None or parsed_doctype == "alias":
             return Kind.Alias
-        elif parsed_doctype in ["data", "const", "attribute"]:
+        elif parsed_doctype in _DATA_DOCTYPES:
             return Kind.Data
-        elif parsed_doctype in ["table"]:
+        elif parsed_doctype == "table":
             return Kind.Table
-        elif parsed_doctype in ["module"]:
+        elif parsed_doctype == "module":
             return Kind.Module
         else:
             return None
@@ -601,13 +598,13 @@ class Enum(Object):
     generics: list[Param] = dataclasses.field(default_factory=list)
 
     def get_kind(self, parsed_doctype: str | None) -> Kind | None:
-        if parsed_doctype in [None, "enum"]:
+        if parsed_doctype is None or parsed_doctype == "enum":
             return Kind.Enum
-        elif parsed_doctype in ["data", "const", "attribute"]:
+        elif parsed_doctype in _DATA_DOCTYPES:
             return Kind.Data
-        elif parsed_doctype in ["table"]:
+        elif parsed_doctype == "table":
             return Kind.Table
-        elif parsed_doctype in ["module"]:
+        elif parsed_doctype == "module":
             return Kind.Module
         else:
             return None
@@ -397,22 +397,26 @@ def parse_list_option(value: str):
     if not value:
         return True
     else:
-        value = value.strip()
-        if value.startswith("+"):
-            return ["+", *separate_sig(value.lstrip("+, "))]
-        else:
-            return separate_sig(value)
+        return list(_parse_list_option(value))
 
 
 def parse_list_option_or_true(value: str):
     if not value:
         return True
     else:
-        value = value.strip()
-        if value.startswith("+"):
-            return ["+", *separate_sig(value.lstrip("+, "))]
-        else:
-            return separate_sig(value)
+        # Return a new list every time, callers are allowed to modify it.
+        return list(_parse_list_option(value))
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_list_option(value: str) -> tuple[str, ...]:
+    # Same member lists are given to many directives, i.e. via default options
+    # or `!doc` comments.
+    value = value.strip()
+    if value.startswith("+"):
+        return ("+", *separate_sig(value.lstrip("+, ")))
+    else:
+        return tuple(separate_sig(value))
 
 
 _VCS_MARKERS = [".git", ".hg", ".svn"]
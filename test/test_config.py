@@ -0,0 +1,99 @@
+import fnmatch
+import os
+import re
+
+import pytest
+from sphinx.errors import ConfigError
+
+from sphinx_lua_ls.config import _api_roots, _version, compile_mod_filter
+
+
+def _roots(value, root):
+    return _api_roots("roots", value, root, 4, {}, frozenset(), "rst", False)
+
+
+def test_api_roots_inside_root():
+    root = os.path.abspath("/src")
+    roots = _roots({"mod": "api", "root": "."}, root)
+    assert str(roots["mod"]["path"]) == os.path.join(root, "api")
+    assert str(roots["root"]["path"]) == root
+
+
+def test_api_roots_outside_root():
+    with pytest.raises(ConfigError, match="lays outside of src root"):
+        _roots({"mod": "../api"}, os.path.abspath("/src"))
+    with pytest.raises(ConfigError, match="lays outside of src root"):
+        _roots({"mod": "/src-api"}, os.path.abspath("/src"))
+
+
+def test_api_roots_case_insensitive(monkeypatch):
+    monkeypatch.setattr(os.path, "normcase", str.lower)
+    roots = _roots({"mod": "/src/api"}, "/SRC")
+    assert str(roots["mod"]["path"]) == "/src/api"
+
+
+_MOD_NAMES = [
+    "",
+    "foo",
+    "fo",
+    "foobar",
+    "foo.",
+    "foo.a",
+    "foo.c",
+    "foo.bar",
+    "foo.bar.baz",
+    "foo.x.bar",
+    "foo\nbar",
+    "foo.\n",
+    "boo",
+    "x.internal",
+    "a.b.internal",
+    "[foo]",
+]
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        [],
+        ["foo"],
+        ["foo", "foo.bar"],
+        ["foo.*"],
+        ["foo.bar.*"],
+        ["foo.*", "boo"],
+        ["foo.[ab]*"],
+        ["f?o"],
+        ["[!f]oo"],
+        ["[[]foo]"],
+        ["*.internal"],
+        ["foo.*.bar"],
+        ["foo*"],
+        ["*"],
+        ["foo", "foo.bar.*", "*.internal", "[!f]oo"],
+    ],
+)
+def test_compile_mod_filter(patterns):
+    # Filter should match exactly the same names as a regex
+    # joined from `fnmatch.translate` outputs.
+    expected = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+    mod_filter = compile_mod_filter(frozenset(patterns))
+    for name in _MOD_NAMES:
+        assert bool(mod_filter(name)) == bool(patterns and expected.match(name)), name
+
+
+@pytest.mark.parametrize("version", ["1", "1.2", "3.16.0", "10.20.30.40"])
+def test_version(version):
+    assert _version("lua_ls_min_version", version) == version
+
+
+@pytest.mark.parametrize(
+    "version", ["", "v1", "1.", ".1", "1..2", "1.2.x", "1.2 ", " 1.2", "1.2\n", "1-2"]
+)
+def test_version_incorrect(version):
+    with pytest.raises(ConfigError, match="incorrect lua_ls_min_version"):
+        _version("lua_ls_min_version", version)
+
+
+def test_version_not_str():
+    with pytest.raises(ConfigError, match="lua_ls_min_version should be"):
+        _version("lua_ls_min_version", 1)
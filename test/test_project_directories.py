@@ -0,0 +1,65 @@
+import pathlib
+
+import pytest
+
+import sphinx_lua_ls
+from sphinx_lua_ls import _dedup_project_directories
+
+
+@pytest.mark.parametrize(
+    ("dirs", "expected"),
+    [
+        (
+            [],
+            [],
+        ),
+        (
+            ["/b", "/a"],
+            ["/a", "/b"],
+        ),
+        (
+            ["/a", "/a"],
+            ["/a"],
+        ),
+        (
+            ["/a/b", "/a"],
+            ["/a"],
+        ),
+        (
+            ["/a/b/c", "/a/b", "/a"],
+            ["/a"],
+        ),
+        (
+            ["/a-b", "/a/b", "/a"],
+            ["/a", "/a-b"],
+        ),
+        (
+            ["/a-b", "/ab", "/a"],
+            ["/a", "/a-b", "/ab"],
+        ),
+        (
+            ["/a/b", "/a/c", "/a/b/d"],
+            ["/a/b", "/a/c"],
+        ),
+    ],
+)
+def test_dedup_project_directories(dirs, expected):
+    assert _dedup_project_directories(list(map(pathlib.Path, dirs))) == list(
+        map(pathlib.Path, expected)
+    )
+
+
+def test_dedup_project_directories_warns(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(
+        sphinx_lua_ls.logger,
+        "warning",
+        lambda msg, *args, **kwargs: warnings.append(msg % args),
+    )
+    a, b = pathlib.Path("/a"), pathlib.Path("/a/b")
+    _dedup_project_directories([a, a])
+    assert warnings == []
+    _dedup_project_directories([a, b])
+    assert warnings == [
+        f"project directory {b} is inside of {a}, it will not be processed separately"
+    ]
@@ -0,0 +1,266 @@
+import json
+import os
+import pathlib
+
+import pytest
+
+import sphinx_lua_ls.lua_ls
+
+
+class StubRunner:
+    """
+    Pretends to be a language server, reports lua files as modules whose
+    descriptions are the files' contents. Only reports files in the analyzed
+    directory and outside of the project (i.e. libraries). Runtime version
+    is taken from config files.
+
+    """
+
+    def __init__(self, modules: dict[str, pathlib.Path]):
+        self.modules = modules
+        self.calls: list[pathlib.Path] = []
+        self.quiet: list[bool | None] = []
+
+    def run(self, cwd, quiet=None, configs=None):
+        cwd = pathlib.Path(cwd)
+        self.calls.append(cwd)
+        self.quiet.append(quiet)
+        version = "Lua5.4"
+        for config in configs or []:
+            version = json.loads(config.read_text())["runtime"]["version"]
+        return {
+            "config": {
+                "runtime": {"version": version},
+                "completion": {
+                    "autoRequireFunction": "require",
+                    "autoRequireSeparator": ".",
+                },
+            },
+            "modules": [
+                {
+                    "name": name,
+                    "file": os.path.relpath(path, cwd),
+                    "description": path.read_text(),
+                    "visibility": "public",
+                    "deprecated": False,
+                    "deprecation_reason": None,
+                    "members": [],
+                    "using": [],
+                    "typ": None,
+                }
+                for name, path in self.modules.items()
+                if path.exists()
+                and (path.is_relative_to(cwd) or not path.is_relative_to(cwd.parent))
+            ],
+            "types": [],
+            "globals": [],
+        }
+
+
+def write(path: pathlib.Path, content: str):
+    """
+    Write file and make sure its modification time changes.
+
+    """
+
+    mtime = path.stat().st_mtime_ns + 10**9 if path.exists() else 0
+    path.write_text(content)
+    mtime = max(mtime, path.stat().st_mtime_ns)
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def project(tmp_path: pathlib.Path):
+    src = tmp_path / "src"
+    (src / "lua").mkdir(parents=True)
+    (tmp_path / "lib").mkdir()
+    write(
+        src / "conf.py",
+        'extensions = ["sphinx_lua_ls"]\n'
+        'lua_ls_backend = "emmylua"\n'
+        'lua_ls_project_directories = ["lua"]\n',
+    )
+    write(src / "index.rst", "Index\n=====\n\n.. toctree::\n\n   mod\n   lib\n")
+    write(src / "mod.rst", "Mod\n===\n\n.. lua:automodule:: mod\n")
+    write(src / "lib.rst", "Lib\n===\n\n.. lua:automodule:: lib\n")
+    write(src / "lua" / "mod.lua", "Mod docs.")
+    write(tmp_path / "lib" / "lib.lua", "Lib docs.")
+    return src
+
+
+@pytest.fixture
+def runner(project: pathlib.Path, monkeypatch):
+    runner = StubRunner(
+        {
+            "mod": project / "lua" / "mod.lua",
+            "mod2": project / "lua2" / "mod2.lua",
+            "lib": project.parent / "lib" / "lib.lua",
+        }
+    )
+    monkeypatch.setattr(sphinx_lua_ls.lua_ls, "resolve", lambda **kwargs: runner)
+    return runner
+
+
+@pytest.fixture
+def build(project: pathlib.Path, runner, make_app):
+    def build(**kwargs):
+        app = make_app("html", srcdir=project, **kwargs)
+        app.read_docs = []
+        app.connect(
+            "source-read", lambda app, docname, source: app.read_docs.append(docname)
+        )
+        app.build()
+        return app
+
+    return build
+
+
+def test_no_changes(build, runner):
+    build()
+    assert len(runner.calls) == 1
+
+    app = build()
+    assert len(runner.calls) == 1
+    assert app.read_docs == []
+
+
+def test_foreign_file_changed(project: pathlib.Path, build, runner):
+    build()
+    assert len(runner.calls) == 1
+
+    lib = (project.parent / "lib" / "lib.lua").resolve()
+    write(lib, "New lib docs.")
+    app = build()
+    assert len(runner.calls) == 2
+    assert app.env.get_domain("lua").data["objtree_changed"] == {str(lib)}
+    assert app.read_docs == ["lib"]
+    assert "New lib docs." in (app.outdir / "lib.html").read_text()
+
+
+def test_output_reused(project: pathlib.Path, build, runner):
+    (project / "lua2").mkdir()
+    write(project / "lua2" / "mod2.lua", "Mod2 docs.")
+    write(
+        project / "conf.py",
+        (project / "conf.py").read_text()
+        + 'lua_ls_project_directories = ["lua", "lua2"]\n',
+    )
+    app = build()
+    assert sorted(runner.calls) == [project / "lua", project / "lua2"]
+    assert "objtree_dir_outputs" not in app.env.get_domain("lua").data
+    # Parallel runs can't print to the console.
+    assert runner.quiet == [True, True]
+
+    write(project / "lua2" / "mod2.lua", "New mod2 docs.")
+    build()
+    assert runner.calls[2:] == [project / "lua2"]
+
+    # Output of both directories depends on the library.
+    write(project.parent / "lib" / "lib.lua", "New lib docs.")
+    build()
+    assert sorted(runner.calls[3:]) == [project / "lua", project / "lua2"]
+
+
+def test_runtime_version_changed(project: pathlib.Path, build, runner):
+    write(project / ".luarc.json", '{"runtime": {"version": "Lua5.1"}}')
+    app = build()
+    assert app.env.get_domain("lua").lua_version == "5.1"
+
+    write(project / ".luarc.json", '{"runtime": {"version": "Lua5.3"}}')
+    app = build()
+    assert len(runner.calls) == 2
+    assert app.env.get_domain("lua").lua_version == "5.3"
+    assert app.env.get_domain("lua").config.lua_version is None
+
+
+def test_runtime_version_overridden(project: pathlib.Path, build):
+    write(project / ".luarc.json", '{"runtime": {"version": "Lua5.1"}}')
+    write(
+        project / "conf.py",
+        (project / "conf.py").read_text() + 'lua_ls_lua_version = "jit"\n',
+    )
+    app = build()
+    assert app.env.get_domain("lua").lua_version == "jit"
+
+
+def test_lua_file_changed(project: pathlib.Path, build, runner):
+    build()
+
+    write(project / "lua" / "mod.lua", "New mod docs.")
+    app = build()
+    assert len(runner.calls) == 2
+    assert app.read_docs == ["mod"]
+    assert "New mod docs." in (app.outdir / "mod.html").read_text()
+
+
+@pytest.mark.parametrize("freshenv", [False, True])
+def test_symlink_retargeted(project: pathlib.Path, build, freshenv):
+    (project / "lua2").mkdir()
+    (project / "link").symlink_to("lua")
+    write(
+        project / "conf.py",
+        (project / "conf.py").read_text() + 'lua_ls_project_directories = ["link"]\n',
+    )
+    app = build()
+    assert app.env.get_domain("lua").config.project_directories == [
+        (project / "lua").resolve()
+    ]
+
+    (project / "link").unlink()
+    (project / "link").symlink_to("lua2")
+    app = build(freshenv=freshenv)
+    assert app.env.get_domain("lua").config.project_directories == [
+        (project / "lua2").resolve()
+    ]
+
+
+@pytest.mark.parametrize("name", ["lua/mod.lua", "../lib/lib.lua"])
+def test_lua_file_changed_mtime_preserved(project: pathlib.Path, build, name):
+    build()
+
+    # Modification time is older than doctrees, i.e. when files are restored
+    # from an archive. Sphinx won't re-read documents on its own.
+    path = project / name
+    mtime = path.stat().st_mtime_ns
+    path.write_text("New docs.")
+    os.utime(path, ns=(mtime + 1, mtime + 1))
+    app = build()
+    assert app.read_docs == [path.stem]
+
+
+def test_config_added(project: pathlib.Path, build, runner):
+    build()
+
+    write(project / ".luarc.json", '{"runtime": {"version": "Lua5.1"}}')
+    app = build()
+    assert len(runner.calls) == 2
+    assert app.env.get_domain("lua").lua_version == "5.1"
+
+
+def test_lua_file_changed_mtime_older(project: pathlib.Path, build, runner):
+    build()
+
+    # Restored from an archive with an older modification time.
+    path = project / "lua" / "mod.lua"
+    mtime = path.stat().st_mtime_ns - 10**9
+    path.write_text("New mod docs.")
+    os.utime(path, ns=(mtime, mtime))
+    app = build()
+    assert len(runner.calls) == 2
+    assert "New mod docs." in (app.outdir / "mod.html").read_text()
+
+
+def test_fresh_env(project: pathlib.Path, build, runner):
+    build()
+
+    build(freshenv=True)
+    assert len(runner.calls) == 2
+
+
+def test_env_lost(project: pathlib.Path, build, runner):
+    app = build()
+
+    (app.doctreedir / "environment.pickle").unlink()
+    app = build()
+    assert len(runner.calls) == 1
+    assert sorted(app.read_docs) == ["index", "lib", "mod"]